@@ -1,18 +1,191 @@
 """
 __main__.py
 
+Without a command, evolve organisms and offer to play the best one. The evolve command runs
+without any prompts, and play only plays an organism from a report. Modules are imported by the
+commands that need them, so batch jobs don't pay for the interactive ones.
+
 @author Elliot Penson
 """
 
-from crayons import magenta
+from argparse import SUPPRESS, ArgumentParser, ArgumentTypeError
+
+from embark import parameters
+
+ENGINES = ["Game", "FastGame", "GameBatch"]
+
+# Run options that only evolution.run supports, not islands.run.
+ISLAND_UNSUPPORTED = ["checkpoint", "resume", "results", "profile", "archive", "baselines",
+                      "trace"]
+
+
+def main(argv=None):
+    parser = ArgumentParser(prog="embark", description="EMbArK: Evolutionary MAchi Koro")
+    add_run_arguments(parser)
+    # The evolve command accepts the run options too. Its copies have no defaults, so they don't
+    # overwrite options given before the command.
+    run_options = ArgumentParser(add_help=False, argument_default=SUPPRESS)
+    add_run_arguments(run_options)
+    commands = parser.add_subparsers(dest="command")
+    evolve_parser = commands.add_parser("evolve", help="evolve organisms without any prompts",
+                                        parents=[run_options])
+    add_parameter_arguments(evolve_parser)
+    evolve_parser.add_argument("--output", metavar="PATH",
+                               help="export the most fit organism to this CSV file")
+    play_parser = commands.add_parser("play", help="play an organism from a report")
+    play_parser.add_argument("report", help="organisms written by evolution.export")
+    play_parser.add_argument("--organism", default="best",
+                             help="row number of the organism to play, or best (the default)")
+    arguments = parser.parse_args(argv)
+    if arguments.islands:
+        unsupported = [option for option in ISLAND_UNSUPPORTED if getattr(arguments, option)]
+        if unsupported:
+            parser.error(f"--islands can't be combined with "
+                         f"{', '.join('--' + option for option in unsupported)}")
+    if arguments.trace and (getattr(arguments, "workers", parameters.WORKERS) > 1 or
+                            getattr(arguments, "engine", "Game") != "Game"):
+        parser.error("--trace needs the Game engine and a single worker")
+    if arguments.profile and getattr(arguments, "engine", "Game") != "Game":
+        parser.error("--profile needs the Game engine")
+
+    if arguments.command == "evolve":
+        evolve(arguments)
+    elif arguments.command == "play":
+        play(arguments)
+    else:
+        interactive(arguments)
+
+
+def add_run_arguments(parser):
+    parser.add_argument("--checkpoint", metavar="PATH",
+                        help="periodically save the generation to this file")
+    parser.add_argument("--resume", metavar="PATH",
+                        help="continue evolution from a checkpoint (and keep saving to it)")
+    parser.add_argument("--results", metavar="PATH",
+                        help="append every generation's organisms to this CSV file")
+    parser.add_argument("--baselines", metavar="PATH",
+                        help="append the best organism's win rates against reference strategies "
+                             "to this CSV file every few rounds")
+    parser.add_argument("--archive", metavar="DIRECTORY",
+                        help="archive every generation as memory-mappable .npy files")
+    parser.add_argument("--islands", type=int, metavar="K",
+                        help="evolve K sub-populations in parallel, with migration between them")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="record a sample of fitness games to this file (see trace.py)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each phase of the games and print a summary")
+
+
+def add_parameter_arguments(parser):
+    """Add an option for each value in parameters.py, defaulting to that value."""
+    def optional_int(value):
+        return None if value == "none" else int(value)
+
+    def cull_fraction(value):
+        fraction = float(value)
+        if not 0 <= fraction < 1:
+            raise ArgumentTypeError(f"must be at least 0 and below 1, not {value}")
+        return fraction
+
+    parser.add_argument("--rounds", type=int, default=parameters.NUMBER_OF_ROUNDS)
+    parser.add_argument("--size", type=int, default=parameters.GENERATION_SIZE)
+    parser.add_argument("--recombination-probability", type=float,
+                        default=parameters.RECOMBINATION_PROBABILITY)
+    parser.add_argument("--mutation-probability", type=float,
+                        default=parameters.MUTATION_PROBABILITY)
+    parser.add_argument("--mutation-width", type=float,
+                        default=parameters.MUTATION_GAUSSIAN_WIDTH)
+    parser.add_argument("--workers", type=int, default=parameters.WORKERS)
+    parser.add_argument("--opponents", type=optional_int, default=parameters.OPPONENTS,
+                        help="opponents per organism, or none for a round robin")
+    parser.add_argument("--adaptive", action="store_true", default=parameters.ADAPTIVE)
+    parser.add_argument("--table-size", type=int, choices=[2, 3, 4], default=parameters.TABLE_SIZE,
+                        help="players per game when measuring fitness")
+    parser.add_argument("--table-rounds", type=int, default=parameters.TABLE_ROUNDS)
+    parser.add_argument("--selection", choices=["roulette", "sus"],
+                        default=parameters.SELECTION)
+    parser.add_argument("--cull", type=cull_fraction, default=parameters.CULL_FRACTION,
+                        help="fraction of children discarded by surrogate fitness before play")
+    parser.add_argument("--checkpoint-interval", type=int,
+                        default=parameters.CHECKPOINT_INTERVAL)
+    parser.add_argument("--baseline-interval", type=int, default=parameters.BASELINE_INTERVAL)
+    parser.add_argument("--trace-sample-every", type=int, default=parameters.TRACE_SAMPLE_EVERY,
+                        help="record one in this many fitness games to the trace file")
+    parser.add_argument("--migration-interval", type=int,
+                        default=parameters.MIGRATION_INTERVAL)
+    parser.add_argument("--migrants", type=int, default=parameters.MIGRANTS)
+    parser.add_argument("--engine", choices=ENGINES, default="Game",
+                        help="game implementation used to measure fitness")
+    parser.add_argument("--seed", type=int)
+
+
+def run_evolution(arguments, **options):
+    """Call evolution.run, or islands.run when islands are requested. Return the winner."""
+    if arguments.islands:
+        from embark import islands
+        return islands.run(islands=arguments.islands, **options)
+    from embark import evolution
+    return evolution.run(checkpoint_path=arguments.checkpoint or arguments.resume,
+                         resume_path=arguments.resume,
+                         profile=arguments.profile,
+                         results_path=arguments.results,
+                         archive_path=arguments.archive,
+                         baselines_path=arguments.baselines,
+                         trace_path=arguments.trace,
+                         **options)
+
+
+def evolve(arguments):
+    from embark import evolution
+    options = dict(rounds=arguments.rounds, size=arguments.size, seed=arguments.seed,
+                   engine=load_engine(arguments.engine), workers=arguments.workers,
+                   opponents=arguments.opponents, adaptive=arguments.adaptive,
+                   table_size=arguments.table_size, table_rounds=arguments.table_rounds,
+                   selection=arguments.selection, cull=arguments.cull,
+                   recombination_probability=arguments.recombination_probability,
+                   mutation_probability=arguments.mutation_probability,
+                   mutation_width=arguments.mutation_width)
+    if arguments.islands:
+        options.update(migration_interval=arguments.migration_interval,
+                       migrants=arguments.migrants)
+    else:
+        options.update(checkpoint_interval=arguments.checkpoint_interval,
+                       baseline_interval=arguments.baseline_interval,
+                       trace_sample_every=arguments.trace_sample_every)
+    winner = run_evolution(arguments, **options)
+    print("The most fit organism had the following chromosome:")
+    evolution.print_organism(winner)
+    if arguments.output:
+        evolution.export([winner], arguments.output)
+
+
+def load_engine(name):
+    if name == "FastGame":
+        from embark.engine import FastGame
+        return FastGame
+    if name == "GameBatch":
+        from embark.batch import GameBatch
+        return GameBatch
+    from embark.machi_koro import Game
+    return Game
+
+
+def play(arguments):
+    from embark.evolution import Organism, load_organisms
+    from embark.play import human_vs_computer
+    import numpy
+
+    genes = load_organisms(arguments.report)[arguments.organism]
+    human_vs_computer(Organism(genes=numpy.array(genes)))
 
-from embark import evolution
-from embark.play import human_vs_computer
 
+def interactive(arguments):
+    from crayons import magenta
+    from embark import evolution
+    from embark.play import human_vs_computer
 
-def main():
     print(magenta("EMbArK: Evolutionary MAchi Koro", bold=True))
-    winner = evolution.run()
+    winner = run_evolution(arguments)
     print("The most fit organism had the following chromosome:")
     evolution.print_organism(winner)
     if input("Would you like to play the best organism? [y/n] ") == "y":
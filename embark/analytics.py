@@ -0,0 +1,96 @@
+"""
+analytics.py
+
+Exact expected income of hands, and a cheap surrogate fitness built on it. Every card pays a
+fixed amount for a given roll, and the dice distribution is known, so expected income can be
+computed directly instead of simulated.
+
+@author Elliot Penson
+"""
+
+import numpy
+
+from embark.batch import OWN_TURN_ARRAYS, OFF_TURN_ARRAYS, COST_ARRAY, IS_LANDMARK
+from embark.engine import CAFE_BONUS, DOUBLE_ROLL
+from embark.machi_koro import MAX_ROLL, STARTING_HAND, STARTING_BALANCE
+
+# Rounds (a turn for each of two players) played by the expected-value model of surrogate_fitness.
+SURROGATE_ROUNDS = 60
+
+
+def make_roll_probabilities(n_dice):
+    """Return an array of the probability of each roll number (index) with n six-sided dice."""
+    probabilities = numpy.zeros(MAX_ROLL + 1)
+    probabilities[0] = 1
+    for _ in range(n_dice):
+        probabilities = numpy.convolve(probabilities, [0] + [1 / 6] * 6)[:MAX_ROLL + 1]
+    return probabilities
+
+
+ONE_DIE = make_roll_probabilities(1)
+TWO_DICE = make_roll_probabilities(2)
+
+
+def income_by_roll(hands, own_turn):
+    """Return the coins each hand earns for each roll number, as a (hands x MAX_ROLL + 1) array.
+    Hands are rows of card counts in ALL_CARDS order, and counts may be fractional. Coins taken
+    from opponents are counted in full, and trades are ignored.
+    """
+    income, steals, multipliers, _ = OWN_TURN_ARRAYS if own_turn else OFF_TURN_ARRAYS
+    hands = numpy.atleast_2d(hands)
+    payouts = income + steals  # [roll, has cafe bonus, card]
+    # A fractional Shopping Mall pays its bonus in proportion.
+    bonus = numpy.minimum(hands[:, CAFE_BONUS].sum(axis=1), 1)[:, numpy.newaxis]
+    earned = ((1 - bonus) * (hands @ payouts[:, 0].T) + bonus * (hands @ payouts[:, 1].T))
+    for index, multiplied, rewards in multipliers:
+        earned += numpy.outer(hands[:, index] * hands[:, multiplied].sum(axis=1), rewards)
+    return earned
+
+
+def roll_probabilities(hands):
+    """Return the probability of each roll for each hand. Hands with a Train Station roll two
+    dice, as the engines do.
+    """
+    two_dice = numpy.minimum(numpy.atleast_2d(hands)[:, DOUBLE_ROLL].sum(axis=1), 1)
+    return numpy.outer(1 - two_dice, ONE_DIE) + numpy.outer(two_dice, TWO_DICE)
+
+
+def expected_income(hands, own_turn=True):
+    """Return the exact expected coins per turn of each hand, on its own turn or on an
+    opponent's turn. The opponent is assumed to roll like the hand itself.
+    """
+    return (roll_probabilities(hands) * income_by_roll(hands, own_turn)).sum(axis=1)
+
+
+def surrogate_fitness(population, rounds=SURROGATE_ROUNDS):
+    """Estimate how quickly each row of genes builds toward its landmarks, without simulating
+    any games. Every organism starts with the starting hand and plays an expected-value model of
+    the game: each round it earns its expected income on and off turn, then buys a fraction of
+    every affordable card equal to the chance of choosing it. Return the coins put into
+    landmarks after a number of rounds. Organisms that never buy landmarks score zero.
+
+    :param population: (organisms x len(ALL_CARDS)) array of genes
+    """
+    population = numpy.asarray(population, dtype=float)
+    hands = numpy.tile(numpy.array(STARTING_HAND, dtype=float), (len(population), 1))
+    balances = numpy.full(len(population), float(STARTING_BALANCE))
+    invested = numpy.zeros(len(population))
+    for _ in range(rounds):
+        balances += expected_income(hands, True) + expected_income(hands, False)
+        # Landmarks that are (partly) owned are less likely to be on offer.
+        weights = population * numpy.where(IS_LANDMARK, numpy.clip(1 - hands, 0, 1), 1)
+        totals = weights.sum(axis=1, keepdims=True)
+        chances = weights / numpy.where(totals > 0, totals, 1)
+        bought = chances * (COST_ARRAY <= balances[:, numpy.newaxis])
+        hands += bought
+        balances -= bought @ COST_ARRAY
+        invested += (bought * IS_LANDMARK) @ COST_ARRAY
+    return invested
+
+
+def cull(population, keep, rounds=SURROGATE_ROUNDS):
+    """Return the indexes of the keep rows of a population with the best surrogate fitness, in
+    their original order.
+    """
+    scores = surrogate_fitness(population, rounds)
+    return numpy.sort(numpy.argsort(-scores, kind="stable")[:keep])
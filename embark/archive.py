@@ -0,0 +1,171 @@
+"""
+archive.py
+
+Keep every generation of a run in .npy files that can be memory-mapped, so a notebook can slice
+any generation, card or organism without reading the whole run:
+
+    archive = open_archive("run")
+    archive.genes[-1]                      # The last generation, organisms x cards.
+    card_history(archive, "TrainStation")  # Generations x organisms.
+
+A directory holds genes.npy (generations x organisms x len(ALL_CARDS)), wins.npy and fitness.npy
+(generations x organisms), and manifest.json, which names the card columns and counts the
+generations written.
+
+@author Elliot Penson
+"""
+
+from collections import namedtuple
+import json
+import os
+import tempfile
+
+import numpy
+
+from embark.machi_koro import ALL_CARDS
+from embark.parameters import RESULTS_FLUSH_INTERVAL
+
+MAGIC = b"\x93NUMPY\x01\x00"
+
+# Bytes reserved for each .npy header, so the header can be rewritten in place as a file grows.
+HEADER_SIZE = 128
+
+Archive = namedtuple("Archive", ["cards", "genes", "wins", "fitness"])
+
+
+def write_header(file, dtype, shape):
+    """Write a version 1.0 .npy header, padded to HEADER_SIZE bytes."""
+    header = repr({"descr": numpy.lib.format.dtype_to_descr(numpy.dtype(dtype)),
+                   "fortran_order": False, "shape": tuple(shape)})
+    padding = HEADER_SIZE - len(MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError(f"The header for shape {shape} doesn't fit in {HEADER_SIZE} bytes.")
+    file.seek(0)
+    file.write(MAGIC + (HEADER_SIZE - len(MAGIC) - 2).to_bytes(2, "little"))
+    file.write(header.encode("latin1") + b" " * padding + b"\n")
+
+
+class ArchiveWriter:
+
+    # Name, dtype and shape of one organism's entry for each array in an archive.
+    ARRAYS = [("genes", float, (len(ALL_CARDS),)), ("wins", float, ()), ("fitness", float, ())]
+
+    def __init__(self, path, flush_interval=RESULTS_FLUSH_INTERVAL):
+        """Append the genes, wins and fitness of every generation to an archive directory,
+        continuing an archive that already exists. Generations are buffered and written every
+        flush_interval generations. Every generation must have the same number of organisms.
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer = []
+        os.makedirs(path, exist_ok=True)
+        manifest = read_manifest(path)
+        self.generations = manifest["generations"] if manifest else 0
+        self.organisms = manifest["organisms"] if manifest else None
+
+    def write(self, generation_index, generation):
+        """Record a generation whose fitness has been set. Generations are stored in the order
+        they are written, so generation_index is only checked against the number written.
+        """
+        if generation_index != self.generations + len(self.buffer):
+            raise ValueError(f"Expected generation {self.generations + len(self.buffer)}, "
+                             f"not {generation_index}.")
+        if self.organisms is None:
+            self.organisms = len(generation)
+        if len(generation) != self.organisms:
+            raise ValueError(f"The archive holds {self.organisms} organisms per generation, "
+                             f"not {len(generation)}.")
+        self.buffer.append((numpy.array([organism.genes for organism in generation]),
+                            numpy.array([organism.wins for organism in generation]),
+                            numpy.array([organism.fitness for organism in generation])))
+        if len(self.buffer) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered generations to the .npy files, then update the manifest."""
+        if not self.buffer:
+            return
+        generations = self.generations + len(self.buffer)
+        for (name, dtype, shape), columns in zip(self.ARRAYS, zip(*self.buffer)):
+            with open(self.array_path(name), "r+b" if self.generations else "wb") as file:
+                file.seek(HEADER_SIZE + self.generations * self.row_bytes(dtype, shape))
+                file.write(numpy.ascontiguousarray(columns, dtype=dtype).tobytes())
+                file.truncate()
+                write_header(file, dtype, (generations, self.organisms) + shape)
+        self.generations = generations
+        self.buffer = []
+        self.write_manifest()
+
+    def truncate(self, generations):
+        """Forget generations written after the first few, such as when a run is resumed from
+        an earlier checkpoint. Forgetting every generation also forgets the number of organisms,
+        so a new run can store generations of another size.
+        """
+        self.buffer = []
+        self.generations = min(self.generations, generations)
+        if self.generations == 0:
+            self.organisms = None
+            for path in [self.array_path(name) for name, _, _ in self.ARRAYS] + \
+                    [os.path.join(self.path, "manifest.json")]:
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        for name, dtype, shape in self.ARRAYS:
+            if os.path.exists(self.array_path(name)):
+                with open(self.array_path(name), "r+b") as file:
+                    file.truncate(HEADER_SIZE + self.generations * self.row_bytes(dtype, shape))
+                    write_header(file, dtype, (self.generations, self.organisms) + shape)
+        self.write_manifest()
+
+    def row_bytes(self, dtype, shape):
+        return self.organisms * int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize
+
+    def array_path(self, name):
+        return os.path.join(self.path, name + ".npy")
+
+    def write_manifest(self):
+        """Replace manifest.json in one step, so readers never see a partial file."""
+        manifest = {"cards": [card.__name__ for card in ALL_CARDS],
+                    "organisms": self.organisms,
+                    "generations": self.generations,
+                    "arrays": {name: name + ".npy" for name, _, _ in self.ARRAYS}}
+        with tempfile.NamedTemporaryFile("w", dir=self.path, suffix=".tmp",
+                                         delete=False) as temporary:
+            json.dump(manifest, temporary, indent=2)
+        os.replace(temporary.name, os.path.join(self.path, "manifest.json"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.flush()
+
+
+def read_manifest(path):
+    """Return the manifest of an archive directory, or None if it has none yet."""
+    manifest_path = os.path.join(path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def open_archive(path):
+    """Memory-map an archive for reading. Return an Archive of the card names and the genes,
+    wins and fitness arrays, each limited to the generations counted in the manifest.
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"{path} has no manifest.json.")
+    arrays = {}
+    for name, file_name in manifest["arrays"].items():
+        array = numpy.load(os.path.join(path, file_name), mmap_mode="r")
+        arrays[name] = array[:manifest["generations"]]
+    return Archive(manifest["cards"], **arrays)
+
+
+def card_history(archive, card_name):
+    """Return the gene of one card for every organism of every generation in an archive, as a
+    (generations x organisms) view.
+    """
+    return archive.genes[:, :, archive.cards.index(card_name)]
@@ -0,0 +1,170 @@
+"""
+baselines.py
+
+Measure an organism against a fixed suite of reference strategies. Fitness during evolution is
+relative to the rest of a drifting population, so these win rates are the absolute measure of
+whether champions get stronger. Evaluate the organisms in a report written by evolution.export:
+
+    python -m embark.baselines report.csv --games 10000 --workers 8
+
+@author Elliot Penson
+"""
+
+from argparse import ArgumentParser
+
+import numpy
+
+from embark.evolution import (Organism, load_organisms, play_pairs, seeded_random,
+                              PAIRINGS_PER_BLOCK)
+from embark.parameters import BASELINE_GAMES, WORKERS
+from embark.rating import wilson_interval
+from embark.results_log import append_rows
+from embark.strategies import RandomPlayer, CheapestPlayer, ExpensivePlayer, LandmarkRushPlayer
+
+BASELINES = {"random": RandomPlayer,
+             "cheapest": CheapestPlayer,
+             "expensive": ExpensivePlayer,
+             "landmark-rush": LandmarkRushPlayer}
+
+
+def play_baseline_block(genes, baseline, games, seed):
+    """Play an organism against one baseline, alternating which of them goes first. Return the
+    number of games the organism won.
+
+    :param seed: A numpy.random.SeedSequence for the dice and both players
+    """
+    organism = Organism(genes=numpy.array(genes, dtype=float))
+    # The first two words seed the random modules (see seeded_random).
+    opponent = BASELINES[baseline](int(seed.generate_state(3)[2]))
+    pairs = [(organism, opponent) if game % 2 == 0 else (opponent, organism)
+             for game in range(games)]
+    # Organisms draw their purchases from the random module.
+    with seeded_random(seed):
+        winners = play_pairs(pairs, seed=seed)
+    return sum(winner is organism for winner in winners)
+
+
+def make_blocks(games, seed=None):
+    """Split an evaluation into blocks of games that can each be played by any worker. Return a
+    list of (baseline, games, numpy.random.SeedSequence) tuples.
+
+    :param seed: An int, a numpy.random.SeedSequence or None
+    """
+    if not isinstance(seed, numpy.random.SeedSequence):
+        seed = numpy.random.SeedSequence(seed)
+    blocks = [(baseline, min(PAIRINGS_PER_BLOCK, games - start))
+              for baseline in BASELINES for start in range(0, games, PAIRINGS_PER_BLOCK)]
+    seeds = seed.spawn(len(blocks))
+    return [(baseline, block_games, block_seed)
+            for (baseline, block_games), block_seed in zip(blocks, seeds)]
+
+
+def summarize(blocks, wins):
+    """Add up the wins of each block. Return a dict of baseline -> (games, win rate, low, high),
+    where low and high bound the win rate with a Wilson interval.
+    """
+    total_wins, total_games = dict.fromkeys(BASELINES, 0), dict.fromkeys(BASELINES, 0)
+    for (baseline, games, _), block_wins in zip(blocks, wins):
+        total_wins[baseline] += block_wins
+        total_games[baseline] += games
+    return {baseline: (total_games[baseline],
+                       total_wins[baseline] / max(total_games[baseline], 1),
+                       *wilson_interval(total_wins[baseline], total_games[baseline]))
+            for baseline in BASELINES}
+
+
+def evaluate(genes, games=BASELINE_GAMES, workers=WORKERS, seed=None):
+    """Play games against every baseline, across a pool of worker processes when there is more
+    than one worker. See summarize for the result.
+    """
+    blocks = make_blocks(games, seed)
+    baselines, block_games, seeds = zip(*blocks)
+    arguments = [[list(genes)] * len(blocks), baselines, block_games, seeds]
+    if workers > 1:
+        # Imported here, since starting up multiprocessing is slow and often not needed.
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            wins = list(pool.map(play_baseline_block, *arguments))
+    else:
+        wins = list(map(play_baseline_block, *arguments))
+    return summarize(blocks, wins)
+
+
+class BaselineMonitor:
+
+    def __init__(self, path, games=BASELINE_GAMES, workers=WORKERS, seed=None):
+        """Evaluate champions in the background while evolution continues, and append their
+        win rates to a CSV file as the evaluations finish. The games run in worker processes,
+        so evolution in this process only waits for them when the monitor is closed. One
+        evaluation runs at a time.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        self.path = path
+        self.games = games
+        self.executor = ProcessPoolExecutor(workers)
+        self.seeds = numpy.random.SeedSequence(seed)
+        self.running = None  # (generation index, blocks, futures)
+        self.waiting = None  # (generation index, genes)
+
+    def submit(self, generation_index, genes):
+        """Evaluate the genes of a generation's champion. While an evaluation is running, only
+        the latest champion submitted waits to follow it, and earlier ones are skipped.
+        """
+        self.waiting = (generation_index, list(genes))
+        self.collect()
+
+    def collect(self, wait=False):
+        """Write the results of a finished evaluation and start the waiting one. When waiting,
+        finish every evaluation.
+        """
+        while self.running or self.waiting:
+            if self.running is None:
+                generation_index, genes = self.waiting
+                self.waiting = None
+                blocks = make_blocks(self.games, self.seeds.spawn(1)[0])
+                futures = [self.executor.submit(play_baseline_block, genes, baseline, games,
+                                                seed)
+                           for baseline, games, seed in blocks]
+                self.running = (generation_index, blocks, futures)
+            generation_index, blocks, futures = self.running
+            if not wait and not all(future.done() for future in futures):
+                return
+            self.running = None
+            wins = [future.result() for future in futures]
+            rows = [[generation_index, baseline, *result]
+                    for baseline, result in summarize(blocks, wins).items()]
+            append_rows(self.path, ["Generation", "Baseline", "Games", "WinRate", "Low", "High"],
+                        rows)
+
+    def close(self):
+        self.collect(wait=True)
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def main():
+    parser = ArgumentParser(prog="python -m embark.baselines",
+                            description="Play organisms against reference strategies.")
+    parser.add_argument("report", help="organisms written by evolution.export")
+    parser.add_argument("--organism", default="best",
+                        help="row number of the organism to evaluate, or best (the default)")
+    parser.add_argument("--games", type=int, default=BASELINE_GAMES,
+                        help="games against each reference strategy")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--seed", type=int)
+    arguments = parser.parse_args()
+
+    genes = load_organisms(arguments.report)[arguments.organism]
+    results = evaluate(genes, arguments.games, arguments.workers, arguments.seed)
+    print(f"{'Baseline':<15} {'Games':>7} {'Win rate':>9} {'95% interval':>17}")
+    for baseline, (games, rate, low, high) in results.items():
+        print(f"{baseline:<15} {games:>7} {rate:>9.1%} {low:>8.1%} - {high:.1%}")
+
+
+if __name__ == "__main__":
+    main()
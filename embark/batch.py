@@ -0,0 +1,166 @@
+"""
+batch.py
+
+@author Elliot Penson
+"""
+
+import numpy
+
+from embark import cards
+from embark.engine import (OWN_TURN, OFF_TURN, LANDMARK_INDEXES, MAX_ROLL, COSTS,
+                           SYMBOLS, DOUBLE_ROLL, EXTRA_TURN, CAFE_BONUS, FastGame)
+from embark.machi_koro import ALL_CARDS, STARTING_ESTABLISHMENTS, STARTING_BALANCE
+
+
+def make_payout_arrays(table):
+    """Turn one side of the engine's payout tables into arrays. Income and steals are indexed by
+    [roll, has cafe bonus, card]. Multiplier cards are kept as a short list of (card, multiplied
+    cards, reward by roll) entries.
+    """
+    income = numpy.zeros((MAX_ROLL + 1, 2, len(ALL_CARDS)), dtype=int)
+    steals = numpy.zeros((MAX_ROLL + 1, 2, len(ALL_CARDS)), dtype=int)
+    multipliers = {}
+    trades = numpy.zeros((MAX_ROLL + 1, len(ALL_CARDS)), dtype=int)
+    for roll_number in range(MAX_ROLL + 1):
+        for index, reward, bonus in table["income"][roll_number]:
+            income[roll_number, :, index] = reward, reward + bonus
+        for index, reward, bonus in table["steals"][roll_number]:
+            steals[roll_number, :, index] = reward, reward + bonus
+        for index, multiplied, multiply_by in table["multipliers"][roll_number]:
+            rewards = multipliers.setdefault((index, multiplied), numpy.zeros(MAX_ROLL + 1, int))
+            rewards[roll_number] = multiply_by
+        for index in table["trades"][roll_number]:
+            trades[roll_number, index] = 1
+    multipliers = [(index, list(multiplied), rewards)
+                   for (index, multiplied), rewards in multipliers.items()]
+    return income, steals, multipliers, trades
+
+
+OWN_TURN_ARRAYS = make_payout_arrays(OWN_TURN)
+OFF_TURN_ARRAYS = make_payout_arrays(OFF_TURN)
+COST_ARRAY = numpy.array(COSTS)
+IS_LANDMARK = numpy.isin(numpy.arange(len(ALL_CARDS)), LANDMARK_INDEXES)
+# Every trader in the game is a tower, and towers can't be traded.
+TRADABLE = numpy.array([symbol is not cards.CardSymbol.TOWER for symbol in SYMBOLS])
+
+
+class GameBatch:
+
+    def __init__(self, pairs, rng=None):
+        """Play many games of Machi Koro in lockstep. Every piece of game state is an array with
+        one row per game, and each call to simulate_round advances all unfinished games by one
+        round. The rules match FastGame.
+
+        :param pairs: List of (player1, player2) tuples of Organisms
+        :param rng: A numpy.random.Generator
+        """
+        self.pairs = pairs
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+        n_games, n_cards = len(pairs), len(ALL_CARDS)
+        self.genes = numpy.array([[player.genes for player in pair] for pair in pairs],
+                                 dtype=float).reshape(n_games, 2, n_cards)
+        self.hands = numpy.array([FastGame.make_starting_hand()] * 2 * n_games,
+                                 dtype=int).reshape(n_games, 2, n_cards)
+        self.balances = numpy.full((n_games, 2), STARTING_BALANCE)
+        self.supply = numpy.tile([STARTING_ESTABLISHMENTS.get(card, 0) for card in ALL_CARDS],
+                                 (n_games, 1))
+        self.active = numpy.zeros(n_games, dtype=int)
+        self.winning_seats = numpy.full(n_games, -1)
+
+    @property
+    def winners(self):
+        return [pair[seat] if seat >= 0 else None
+                for pair, seat in zip(self.pairs, self.winning_seats)]
+
+    def simulate_round(self):
+        """Perform roll, earn, and construct stages of a round in every unfinished game."""
+        games = numpy.flatnonzero(self.winning_seats < 0)
+        active = self.active[games]
+        inactive = 1 - active
+        hands, balances = self.hands, self.balances
+
+        # Roll.
+        n_games = len(games)
+        rolls_twice = hands[games, active][:, DOUBLE_ROLL].any(axis=1)
+        first_roll = self.rng.integers(1, 7, n_games)
+        second_roll = self.rng.integers(1, 7, n_games) * rolls_twice
+        roll_number = first_roll + second_roll
+        was_double = rolls_twice & (first_roll == second_roll)
+
+        # Earn.
+        self.collect(games, active, inactive, roll_number, OWN_TURN_ARRAYS)
+        self.collect(games, inactive, active, roll_number, OFF_TURN_ARRAYS)
+
+        # Construct.
+        hand, balance = hands[games, active], balances[games, active]
+        available = (self.supply[games] > 0) | (IS_LANDMARK & (hand == 0))
+        choice = self.sample(self.genes[games, active], available)
+        bought = COST_ARRAY[choice] <= balance
+        buyers, buyer_seats, choice = games[bought], active[bought], choice[bought]
+        hands[buyers, buyer_seats, choice] += 1
+        balances[buyers, buyer_seats] -= COST_ARRAY[choice]
+        establishment = ~IS_LANDMARK[choice]
+        self.supply[buyers[establishment], choice[establishment]] -= 1
+
+        # Check for a winner and pass the dice.
+        hand = hands[games, active]
+        has_won = hand[:, LANDMARK_INDEXES].all(axis=1)
+        self.winning_seats[games[has_won]] = active[has_won]
+        extra_turn = was_double & hand[:, EXTRA_TURN].any(axis=1)
+        self.active[games[~extra_turn]] ^= 1
+
+    def collect(self, games, seats, opponents, roll_number, arrays):
+        """Pay out one player in each game, as in FastGame.collect."""
+        income, steals, multipliers, trades = arrays
+        hand = self.hands[games, seats]
+        has_bonus = hand[:, CAFE_BONUS].any(axis=1).astype(int)
+        earned = (hand * income[roll_number, has_bonus]).sum(axis=1)
+        for index, multiplied, rewards in multipliers:
+            earned += hand[:, index] * rewards[roll_number] * hand[:, multiplied].sum(axis=1)
+        stolen = (hand * steals[roll_number, has_bonus]).sum(axis=1)
+        stolen = numpy.minimum(stolen, self.balances[games, opponents])
+        self.balances[games, seats] += earned + stolen
+        self.balances[games, opponents] -= stolen
+
+        trade_counts = (hand * trades[roll_number]).sum(axis=1)
+        for count in range(trade_counts.max(initial=0)):
+            trading = trade_counts > count
+            self.trade(games[trading], seats[trading], opponents[trading])
+
+    def trade(self, games, seats, opponents):
+        """Swap each owner's least favorite tradable card for the opponent's favorite."""
+        genes = self.genes[games, seats]
+        my_tradables = (self.hands[games, seats] > 0) & TRADABLE
+        their_tradables = (self.hands[games, opponents] > 0) & TRADABLE
+        can_trade = my_tradables.any(axis=1) & their_tradables.any(axis=1)
+        to_give = numpy.where(my_tradables, genes, numpy.inf).argmin(axis=1)
+        to_get = numpy.where(their_tradables, genes, -numpy.inf).argmax(axis=1)
+        games, seats, opponents = games[can_trade], seats[can_trade], opponents[can_trade]
+        to_give, to_get = to_give[can_trade], to_get[can_trade]
+        self.hands[games, seats, to_give] -= 1
+        self.hands[games, opponents, to_give] += 1
+        self.hands[games, opponents, to_get] -= 1
+        self.hands[games, seats, to_get] += 1
+
+    def sample(self, genes, available):
+        return sample_cards(genes, available, self.rng)
+
+    def simulate(self):
+        while (self.winning_seats < 0).any():
+            self.simulate_round()
+
+
+def sample_cards(genes, available, rng):
+    """Choose one available card index per row with probability proportional to its gene, or
+    uniformly when every available gene is zero.
+
+    :param genes: (rows x len(ALL_CARDS)) array
+    :param available: Boolean array of the same shape
+    :param rng: A numpy.random.Generator
+    """
+    weights = numpy.where(available, genes, 0)
+    no_preference = weights.sum(axis=1) == 0
+    weights[no_preference] = available[no_preference]
+    cumulative = weights.cumsum(axis=1)
+    draws = rng.random(len(weights)) * cumulative[:, -1]
+    return (cumulative > draws[:, numpy.newaxis]).argmax(axis=1)
@@ -0,0 +1,227 @@
+"""
+benchmark.py
+
+Measure the speed of the game engines and the genetic algorithm. Run with
+
+    python -m embark.benchmark --output baseline.json
+    python -m embark.benchmark --compare baseline.json
+
+@author Elliot Penson
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+import json
+import platform
+import random
+import subprocess
+import sys
+
+import numpy
+
+from embark.batch import GameBatch
+from embark.cards import CardColor
+from embark.dice import Dice
+from embark.engine import FastGame
+from embark.evolution import (Organism, breed, mutate, normalize, set_fitness, select_parents,
+                              crossover, mutate_rows, normalize_rows)
+from embark.machi_koro import Game, ALL_CARDS, cards_to_mask
+
+SEED = 0
+POPULATION_SIZES = [10, 20, 40]
+
+# A benchmark is flagged when it is this much slower than the baseline.
+DEFAULT_THRESHOLD = 0.1
+
+
+def make_chromosomes(n_chromosomes, seed=SEED):
+    """The same chromosomes on every run."""
+    rng = numpy.random.default_rng(seed)
+    return [normalize(dict(zip(ALL_CARDS, genes)))
+            for genes in rng.random((n_chromosomes, len(ALL_CARDS))).tolist()]
+
+
+def reset_random(seed=SEED):
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+
+def timed(function, *arguments):
+    """Call a function. Return (seconds taken, return value)."""
+    start = perf_counter()
+    value = function(*arguments)
+    return perf_counter() - start, value
+
+
+def bench_engine(engine, n_games):
+    """Return games/sec and turns/sec for a game class."""
+    reset_random()
+    player1, player2 = [Organism(chromosome) for chromosome in make_chromosomes(2)]
+
+    def play():
+        turns = 0
+        for seed in range(n_games):
+            game = engine(player1, player2, Dice(seed))
+            game.simulate()
+            turns += game.turns
+        return turns
+
+    seconds, turns = timed(play)
+    return {"games/s": n_games / seconds, "turns/s": turns / seconds}
+
+
+def bench_batch(n_games):
+    reset_random()
+    pair = tuple(Organism(chromosome) for chromosome in make_chromosomes(2))
+    batch = GameBatch([pair] * n_games, numpy.random.default_rng(SEED))
+    seconds, _ = timed(batch.simulate)
+    return {"games/s": n_games / seconds}
+
+
+def bench_notify(n_calls):
+    """Return card notifications/sec for a hand of every establishment."""
+    reset_random()
+    game = Game(*[Organism(chromosome) for chromosome in make_chromosomes(2)], Dice(SEED))
+    player = game.active_player
+    player.hand = [card(player, game) for card in ALL_CARDS if not card.is_landmark()]
+    hand = [card for card in player.hand if card.color is not CardColor.PURPLE]  # Skip trades.
+
+    def notify():
+        for roll_number in range(n_calls // len(hand)):
+            for card in hand:
+                card.notify(roll_number % 12 + 1)
+
+    seconds, _ = timed(notify)
+    return {"notifications/s": (n_calls // len(hand)) * len(hand) / seconds}
+
+
+def bench_decisions(n_decisions):
+    """Return purchase decisions/sec over a rotating set of availability masks."""
+    reset_random()
+    organism = Organism(make_chromosomes(1)[0])
+    masks = [cards_to_mask(ALL_CARDS[index:]) for index in range(len(ALL_CARDS))]
+
+    def decide():
+        for index in range(n_decisions):
+            organism.construct_from_mask(masks[index % len(masks)])
+
+    seconds, _ = timed(decide)
+    return {"decisions/s": n_decisions / seconds}
+
+
+def bench_operators(n_children):
+    """Return children/sec for breeding followed by mutation."""
+    reset_random()
+    parent1, parent2 = [Organism(chromosome) for chromosome in make_chromosomes(2)]
+
+    def reproduce():
+        for _ in range(n_children):
+            mutate(breed(parent1, parent2))
+
+    seconds, _ = timed(reproduce)
+    return {"children/s": n_children / seconds}
+
+
+def bench_population_operators(size, n_generations):
+    """Return children/sec for the array operators that iterate applies to a whole population."""
+    reset_random()
+    population = numpy.array([list(chromosome.values()) for chromosome in make_chromosomes(size)])
+    fitness = numpy.arange(1, size + 1, dtype=float)
+
+    def reproduce():
+        for _ in range(n_generations):
+            parents = select_parents(fitness, 2 * size)
+            children = crossover(population[parents[0::2]], population[parents[1::2]])
+            normalize_rows(mutate_rows(children, numpy.random.random_sample(size) < 0.25))
+
+    seconds, _ = timed(reproduce)
+    return {"children/s": size * n_generations / seconds}
+
+
+def bench_generation(size, engine):
+    """Return the wall time of one set_fitness call."""
+    reset_random()
+    generation = [Organism(chromosome) for chromosome in make_chromosomes(size)]
+    seconds, _ = timed(set_fitness, generation, engine, 1, SEED)
+    return {"seconds": seconds}
+
+
+def bench_cold_start(arguments, repeats=3):
+    """Return the best wall time of running python -m embark in a new interpreter."""
+    def start():
+        subprocess.run([sys.executable, "-m", "embark"] + arguments, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    return {"seconds": min(timed(start)[0] for _ in range(repeats))}
+
+
+def run_benchmarks(scale=1, population_sizes=POPULATION_SIZES):
+    """Run every benchmark. Scale multiplies the amount of work done by each."""
+    results = {
+        "engine.Game": bench_engine(Game, 200 * scale),
+        "engine.FastGame": bench_engine(FastGame, 200 * scale),
+        "engine.GameBatch": bench_batch(2000 * scale),
+        "Card.notify": bench_notify(100000 * scale),
+        "Organism.construct": bench_decisions(100000 * scale),
+        "breed+mutate": bench_operators(10000 * scale),
+        "iterate.operators": bench_population_operators(1000, 20 * scale),
+    }
+    for size in population_sizes:
+        for engine in [Game, FastGame]:
+            results[f"set_fitness.{engine.__name__}.{size}"] = bench_generation(size, engine)
+    results["cli.help"] = bench_cold_start(["--help"])
+    results["cli.evolve"] = bench_cold_start(["evolve", "--rounds", "0", "--size", "2"])
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return a list of (benchmark, unit, baseline value, value) tuples for every measurement
+    that is more than threshold slower than the baseline. Rates (units ending in "/s") should
+    go up and times should go down.
+    """
+    regressions = []
+    for name, measurements in results.items():
+        for unit, value in measurements.items():
+            if unit not in baseline.get(name, {}):
+                continue
+            expected = baseline[name][unit]
+            if unit.endswith("/s"):
+                is_slower = value < expected * (1 - threshold)
+            else:
+                is_slower = value > expected * (1 + threshold)
+            if is_slower:
+                regressions.append((name, unit, expected, value))
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(prog="python -m embark.benchmark",
+                            description="Benchmark the Machi Koro engines and the GA.")
+    parser.add_argument("--output", metavar="PATH", help="write results as JSON to this file")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON file to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction of slowdown that counts as a regression")
+    parser.add_argument("--scale", type=int, default=1, help="multiply the work per benchmark")
+    arguments = parser.parse_args()
+
+    report = {"python": platform.python_version(),
+              "numpy": numpy.__version__,
+              "results": run_benchmarks(arguments.scale)}
+    for name, measurements in report["results"].items():
+        for unit, value in measurements.items():
+            print(f"{name:<30} {value:>16.3f} {unit}")
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline:
+            regressions = compare(report["results"], json.load(baseline)["results"],
+                                  arguments.threshold)
+        for name, unit, expected, value in regressions:
+            print(f"SLOWER: {name} {unit} went from {expected:.3f} to {value:.3f}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
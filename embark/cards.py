@@ -4,6 +4,7 @@ cards.py
 @author Elliot Penson
 """
 
+from collections import namedtuple
 from enum import Enum, auto
 
 
@@ -31,16 +32,32 @@ class CardSymbol(Enum):
     FRUIT = auto()
 
 
+CardSpec = namedtuple("CardSpec", ["color", "symbol", "activation", "cost", "reward",
+                                   "multiply_on", "multiply_by"])
+# Cards without a reward or multiplier leave those fields out. (namedtuple only takes defaults
+# from Python 3.7.)
+CardSpec.__new__.__defaults__ = (None, None, None)
+CardSpec.__doc__ = """The rules of a card type. Every copy of a card shares its class's spec."""
+
+
 class Card:
+    """A card owned by a player. Cards only hold their owner and game; everything else comes
+    from the CardSpec of their class, whose fields are also readable as class attributes (for
+    example WheatField.cost).
+    """
+
+    __slots__ = ["owner", "game"]
+    spec = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.spec is not None:
+            for field, value in cls.spec._asdict().items():
+                setattr(cls, field, value)
 
-    def __init__(self, color, symbol, owner, game, activation, cost, reward):
-        self.color = color
-        self.symbol = symbol
+    def __init__(self, owner, game):
         self.owner = owner
         self.game = game
-        self.activation = activation
-        self.cost = cost
-        self.reward = reward
 
     def notify(self, roll):
         """React to a roll."""
@@ -57,232 +74,209 @@ class Card:
             # Funds come from the bank.
             self.owner.balance += self.get_reward()
         else:
-            # Funds come from the other player
-            opponent = self.get_opponent()
-            available_reward = min(opponent.balance, self.get_reward())
-            self.owner.balance += available_reward
-            opponent.balance -= available_reward
+            # Funds come from other players.
+            for opponent in self.get_targets():
+                available_reward = min(opponent.balance, self.get_reward())
+                self.owner.balance += available_reward
+                opponent.balance -= available_reward
 
     def get_reward(self):
-        if (any(card.gives_cafe_bonus() for card in self.owner.hand) and
+        if (self.owner.cafe_bonus_cards and
             self.symbol in [CardSymbol.COFFEE, CardSymbol.BREAD]):
             return self.reward + 1
         return self.reward
 
-    def is_landmark(self):
+    @classmethod
+    def is_landmark(cls):
         return False
 
-    def enables_double_roll(self):
+    @classmethod
+    def enables_double_roll(cls):
         return False
 
-    def gives_extra_turn_on_doubles(self):
+    @classmethod
+    def gives_extra_turn_on_doubles(cls):
         return False
 
-    def gives_cafe_bonus(self):
+    @classmethod
+    def gives_cafe_bonus(cls):
         return False
 
-    def get_opponent(self):
-        if self.game.active_player == self.owner:
-            return self.game.inactive_player
-        return self.game.active_player
+    def get_targets(self):
+        """Return the players this card takes coins from. Red cards take from the player who
+        rolled, and purple cards from every opponent.
+        """
+        if self.color is CardColor.RED:
+            return [self.game.active_player]
+        return self.game.opponents[self.owner]
 
-    def switch_owner(self):
-        opponent = self.get_opponent()
-        self.owner.hand.remove(self)
-        opponent.hand.append(self)
-        self.owner = opponent
-
-    def clone(self, purchaser):
-        return Card(self.color,
-                    self.symbol,
-                    purchaser,
-                    self.game,
-                    self.activation,
-                    self.cost,
-                    self.reward)
+    def switch_owner(self, new_owner):
+        self.owner.remove_from_hand(self)
+        new_owner.add_to_hand(self)
+        self.owner = new_owner
 
 
 class MultiplierCard(Card):
 
-    def __init__(self, color, symbol, owner, game, activation, cost, multiply_on, multiply_by):
-        super().__init__(color, symbol, owner, game, activation, cost, None)
-        self.multiply_on = multiply_on
-        self.multiply_by = multiply_by
+    __slots__ = ()
 
     def activate(self):
-        cards_of_symbol = len([card for card in self.owner.hand
-                               if card.symbol is self.multiply_on])
-        self.owner.balance += cards_of_symbol * self.multiply_by
-
-    def clone(self, purchaser):
-        return MultiplierCard(self.color,
-                              self.symbol,
-                              purchaser,
-                              self.game,
-                              self.activation,
-                              self.cost,
-                              self.multiply_on,
-                              self.multiply_by)
+        self.owner.balance += self.owner.symbol_counts[self.multiply_on] * self.multiply_by
 
 
 class TraderCard(Card):
 
-    def __init__(self, color, symbol, owner, game, activation, cost):
-        super().__init__(color, symbol, owner, game, activation, cost, None)
+    __slots__ = ()
 
     def activate(self):
+        if self.game.profiler:
+            self.game.profiler.time("trade", self.trade)
+        else:
+            self.trade()
+
+    def trade(self):
+        """Swap a card with the opponent who owns the card the owner likes best."""
         def find_tradables(player):
             return {card for card in player.hand if card.symbol is not self.symbol}
 
         my_tradables = find_tradables(self.owner)
-        their_tradables = find_tradables(self.get_opponent())
+        their_tradables = set().union(*[find_tradables(opponent)
+                                        for opponent in self.game.opponents[self.owner]])
 
         card_to_give = self.owner.choose_least_favorite_card(my_tradables)
         card_to_get = self.owner.choose_favorite_card(their_tradables)
 
         if card_to_give and card_to_get:
-            card_to_give.switch_owner()
-            card_to_get.switch_owner()
-
-    def purchase(self, purchaser):
-        return TraderCard(self.color,
-                          self.symbol,
-                          purchaser,
-                          self.game,
-                          self.activation,
-                          self.cost)
+            if self.game.trace:
+                self.game.trace.trade(self.owner, card_to_give, card_to_get)
+            card_to_give.switch_owner(card_to_get.owner)
+            card_to_get.switch_owner(self.owner)
 
 
 class Landmark(Card):
 
-    def __init__(self, player, game, cost):
-        super().__init__(CardColor.ORANGE, CardSymbol.TOWER, player, game, [], cost, None)
+    __slots__ = ()
 
-    def is_landmark(self):
+    @classmethod
+    def is_landmark(cls):
         return True
 
 
-class TrainStation(Landmark):
+def landmark_spec(cost):
+    return CardSpec(CardColor.ORANGE, CardSymbol.TOWER, (), cost)
 
-    def __init__(self, player, game):
-        super().__init__(player, game, 4)
 
-    def enables_double_roll(self):
+class TrainStation(Landmark):
+    __slots__ = ()
+    spec = landmark_spec(4)
+
+    @classmethod
+    def enables_double_roll(cls):
         return True
 
 
 class ShoppingMall(Landmark):
+    __slots__ = ()
+    spec = landmark_spec(10)
 
-    def __init__(self, player, game):
-        super().__init__(player, game, 10)
-
-    def gives_cafe_bonus(self):
+    @classmethod
+    def gives_cafe_bonus(cls):
         return True
 
 
 class AmusementPark(Landmark):
+    __slots__ = ()
+    spec = landmark_spec(16)
 
-    def __init__(self, player, game):
-        super().__init__(player, game, 16)
-
-    def gives_extra_turn_on_doubles(self):
+    @classmethod
+    def gives_extra_turn_on_doubles(cls):
         return True
 
 
 class RadioTower(Landmark):
-
-    def __init__(self, player, game):
-        super().__init__(player, game, 22)
+    __slots__ = ()
+    spec = landmark_spec(22)
 
 
 class WheatField(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.BLUE, CardSymbol.WHEAT, player, game, [1], 1, 1)
+    __slots__ = ()
+    spec = CardSpec(CardColor.BLUE, CardSymbol.WHEAT, (1,), 1, 1)
 
 
 class Ranch(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.BLUE, CardSymbol.ANIMAL, player, game, [2], 1, 1)
+    __slots__ = ()
+    spec = CardSpec(CardColor.BLUE, CardSymbol.ANIMAL, (2,), 1, 1)
 
 
 class Bakery(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.GREEN, CardSymbol.BREAD, player, game, [2, 3], 1, 1)
+    __slots__ = ()
+    spec = CardSpec(CardColor.GREEN, CardSymbol.BREAD, (2, 3), 1, 1)
 
 
 class Cafe(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.RED, CardSymbol.COFFEE, player, game, [3], 2, 1)
+    __slots__ = ()
+    spec = CardSpec(CardColor.RED, CardSymbol.COFFEE, (3,), 2, 1)
 
 
 class ConvenienceStore(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.GREEN, CardSymbol.BREAD, player, game, [4], 2, 3)
+    __slots__ = ()
+    spec = CardSpec(CardColor.GREEN, CardSymbol.BREAD, (4,), 2, 3)
 
 
 class Forest(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.BLUE, CardSymbol.GEAR, player, game, [5], 3, 1)
+    __slots__ = ()
+    spec = CardSpec(CardColor.BLUE, CardSymbol.GEAR, (5,), 3, 1)
 
 
 class TVStation(Card):
+    __slots__ = ()
+    spec = CardSpec(CardColor.PURPLE, CardSymbol.TOWER, (6,), 7, 5)
 
-    def __init__(self, player, game):
-        super().__init__(CardColor.PURPLE, CardSymbol.TOWER, player, game, [6], 7, 5)
+    def get_targets(self):
+        opponent = self.owner.choose_opponent(self.game.opponents[self.owner])
+        if self.game.trace:
+            self.game.trace.target(self.owner, opponent)
+        return [opponent]
 
 
 class BusinessCenter(TraderCard):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.PURPLE, CardSymbol.TOWER, player, game, [6], 8)
+    __slots__ = ()
+    spec = CardSpec(CardColor.PURPLE, CardSymbol.TOWER, (6,), 8)
 
 
 class Stadium(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.PURPLE, CardSymbol.TOWER, player, game, [6], 6, 2)
+    __slots__ = ()
+    spec = CardSpec(CardColor.PURPLE, CardSymbol.TOWER, (6,), 6, 2)
 
 
 class CheeseFactory(MultiplierCard):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.GREEN, CardSymbol.FACTORY, player, game, [7], 5,
-                         CardSymbol.ANIMAL, 3)
+    __slots__ = ()
+    spec = CardSpec(CardColor.GREEN, CardSymbol.FACTORY, (7,), 5,
+                    multiply_on=CardSymbol.ANIMAL, multiply_by=3)
 
 
 class FurnitureFactory(MultiplierCard):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.GREEN, CardSymbol.FACTORY, player, game, [8], 3,
-                         CardSymbol.GEAR, 3)
+    __slots__ = ()
+    spec = CardSpec(CardColor.GREEN, CardSymbol.FACTORY, (8,), 3,
+                    multiply_on=CardSymbol.GEAR, multiply_by=3)
 
 
 class Mine(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.BLUE, CardSymbol.GEAR, player, game, [9], 6, 5)
+    __slots__ = ()
+    spec = CardSpec(CardColor.BLUE, CardSymbol.GEAR, (9,), 6, 5)
 
 
 class FamilyRestaurant(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.RED, CardSymbol.COFFEE, player, game, [9, 10], 3, 2)
+    __slots__ = ()
+    spec = CardSpec(CardColor.RED, CardSymbol.COFFEE, (9, 10), 3, 2)
 
 
 class AppleOrchard(Card):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.BLUE, CardSymbol.WHEAT, player, game, [10], 3, 3)
+    __slots__ = ()
+    spec = CardSpec(CardColor.BLUE, CardSymbol.WHEAT, (10,), 3, 3)
 
 
 class FruitAndVegetableMarket(MultiplierCard):
-
-    def __init__(self, player, game):
-        super().__init__(CardColor.GREEN, CardSymbol.FRUIT, player, game, [11, 12], 2,
-                         CardSymbol.WHEAT, 2)
+    __slots__ = ()
+    spec = CardSpec(CardColor.GREEN, CardSymbol.FRUIT, (11, 12), 2,
+                    multiply_on=CardSymbol.WHEAT, multiply_by=2)
@@ -0,0 +1,62 @@
+"""
+checkpoint.py
+
+@author Elliot Penson
+"""
+
+import math
+import os
+import random
+import tempfile
+
+import numpy
+
+
+def save(path, population, generation_index):
+    """Write an evolution run to a .npz file, together with the state of the random and
+    numpy.random modules. The file is written to a temporary name and then renamed, so a crash
+    never leaves a partial checkpoint behind.
+
+    :param population: (organisms x len(ALL_CARDS)) array of genes
+    :param generation_index: Number of completed generations
+    """
+    version, python_state, gauss_next = random.getstate()
+    _, numpy_keys, numpy_position, numpy_has_gauss, numpy_cached_gaussian = \
+        numpy.random.get_state()
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as temporary:
+        try:
+            numpy.savez(temporary,
+                        population=numpy.asarray(population, dtype=float),
+                        generation_index=generation_index,
+                        python_version=version,
+                        python_state=numpy.array(python_state, dtype=numpy.uint32),
+                        python_gauss_next=math.nan if gauss_next is None else gauss_next,
+                        numpy_keys=numpy_keys,
+                        numpy_position=numpy_position,
+                        numpy_has_gauss=numpy_has_gauss,
+                        numpy_cached_gaussian=numpy_cached_gaussian)
+            temporary.flush()
+            os.fsync(temporary.fileno())
+        except BaseException:
+            temporary.close()
+            os.remove(temporary.name)
+            raise
+    os.replace(temporary.name, path)
+
+
+def load(path):
+    """Read a checkpoint written by save and restore the random state it recorded. Return a
+    (population, generation_index) tuple.
+    """
+    with numpy.load(path) as checkpoint:
+        gauss_next = float(checkpoint["python_gauss_next"])
+        random.setstate((int(checkpoint["python_version"]),
+                         tuple(int(word) for word in checkpoint["python_state"]),
+                         None if math.isnan(gauss_next) else gauss_next))
+        numpy.random.set_state(("MT19937",
+                                checkpoint["numpy_keys"],
+                                int(checkpoint["numpy_position"]),
+                                int(checkpoint["numpy_has_gauss"]),
+                                float(checkpoint["numpy_cached_gaussian"])))
+        return checkpoint["population"], int(checkpoint["generation_index"])
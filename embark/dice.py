@@ -0,0 +1,33 @@
+"""
+dice.py
+
+@author Elliot Penson
+"""
+
+import numpy
+
+# Number of rolls generated at a time. Most games need a few hundred.
+BLOCK_SIZE = 256
+
+
+class Dice:
+
+    def __init__(self, seed=None, number_of_die_faces=6, block_size=BLOCK_SIZE):
+        """A die that pre-generates its rolls in blocks. Asking numpy for one number at a time is
+        slow, but handing out numbers from a list is cheap.
+
+        :param seed: Anything numpy.random.default_rng accepts, typically a SeedSequence spawned
+            for one game
+        """
+        self.generator = numpy.random.default_rng(seed)
+        self.number_of_die_faces = number_of_die_faces
+        self.block_size = block_size
+        self.rolls = iter(())
+
+    def roll(self):
+        try:
+            return next(self.rolls)
+        except StopIteration:
+            block = self.generator.integers(1, self.number_of_die_faces + 1, self.block_size)
+            self.rolls = iter(block.tolist())
+            return next(self.rolls)
@@ -0,0 +1,196 @@
+"""
+engine.py
+
+@author Elliot Penson
+"""
+
+from embark import cards
+from embark.dice import Dice
+from embark.machi_koro import (ALL_CARDS, LANDMARKS, STARTING_ESTABLISHMENTS, STARTING_BALANCE,
+                               CARD_INDEX, MAX_ROLL, STARTING_HAND, STARTING_ESTABLISHMENT_MASK,
+                               LANDMARK_MASK, mask_to_cards)
+
+LANDMARK_INDEXES = [CARD_INDEX[landmark] for landmark in LANDMARKS]
+STARTING_SUPPLY = [STARTING_ESTABLISHMENTS.get(card, 0) for card in ALL_CARDS]
+CAFE_BONUS_SYMBOLS = [cards.CardSymbol.COFFEE, cards.CardSymbol.BREAD]
+
+
+def make_tables():
+    """Precompute how every card type reacts to every roll. Rather than asking each card object
+    whether it should activate, the fast engine looks up the roll in these tables and multiplies
+    by the number of copies a player owns.
+    """
+    tables = {is_my_turn: {name: [[] for _ in range(MAX_ROLL + 1)]
+                           for name in ["income", "multipliers", "steals", "trades"]}
+              for is_my_turn in [True, False]}
+    for index, card in enumerate(ALL_CARDS):
+        bonus = int(card.symbol in CAFE_BONUS_SYMBOLS)
+        for roll_number in card.activation:
+            for is_my_turn in [True, False]:
+                if not card.color.can_play(is_my_turn):
+                    continue
+                if issubclass(card, cards.MultiplierCard):
+                    multiplied = tuple(other for other, other_card in enumerate(ALL_CARDS)
+                                       if other_card.symbol is card.multiply_on)
+                    entry, name = (index, multiplied, card.multiply_by), "multipliers"
+                elif issubclass(card, cards.TraderCard):
+                    entry, name = index, "trades"
+                elif card.color in [cards.CardColor.BLUE, cards.CardColor.GREEN]:
+                    entry, name = (index, card.reward, bonus), "income"
+                else:
+                    entry, name = (index, card.reward, bonus), "steals"
+                tables[is_my_turn][name][roll_number].append(entry)
+    return tables
+
+
+TABLES = make_tables()
+OWN_TURN, OFF_TURN = TABLES[True], TABLES[False]
+COSTS = [card.cost for card in ALL_CARDS]
+SYMBOLS = [card.symbol for card in ALL_CARDS]
+DOUBLE_ROLL = [index for index, card in enumerate(ALL_CARDS) if card.enables_double_roll()]
+EXTRA_TURN = [index for index, card in enumerate(ALL_CARDS) if card.gives_extra_turn_on_doubles()]
+CAFE_BONUS = [index for index, card in enumerate(ALL_CARDS) if card.gives_cafe_bonus()]
+
+
+class FastGame:
+
+    def __init__(self, player1, player2, dice=None):
+        """Play Machi Koro by the rules of cards.py, but store each hand as a list of counts (in
+        ALL_CARDS order) instead of Card objects. Players are only asked to construct and to rank
+        card classes, so Organisms can be used interchangeably with Game.
+        """
+        self.players = [player1, player2]
+        self.hands = [self.make_starting_hand(), self.make_starting_hand()]
+        self.balances = [STARTING_BALANCE, STARTING_BALANCE]
+        self.supply = list(STARTING_SUPPLY)
+        self.landmark_masks = [LANDMARK_MASK, LANDMARK_MASK]
+        self.reset(player1, player2, dice)
+
+    def reset(self, player1, player2, dice=None):
+        """Start a new game in this object, restoring the starting position in place."""
+        self.dice = dice if dice is not None else Dice()
+        self.players[:] = player1, player2
+        for hand in self.hands:
+            hand[:] = STARTING_HAND
+        self.balances[:] = STARTING_BALANCE, STARTING_BALANCE
+        self.supply[:] = STARTING_SUPPLY
+        self.establishment_mask = STARTING_ESTABLISHMENT_MASK
+        self.landmark_masks[:] = LANDMARK_MASK, LANDMARK_MASK
+        self.active = 0
+        self.winner = None
+        self.turns = 0
+
+    @staticmethod
+    def make_starting_hand():
+        return list(STARTING_HAND)
+
+    @property
+    def active_player(self):
+        return self.players[self.active]
+
+    @property
+    def inactive_player(self):
+        return self.players[1 - self.active]
+
+    def has_any(self, seat, indexes):
+        hand = self.hands[seat]
+        return any(hand[index] for index in indexes)
+
+    def available_mask(self, seat):
+        return self.establishment_mask | self.landmark_masks[seat]
+
+    def find_available_cards(self, seat):
+        return mask_to_cards(self.available_mask(seat))
+
+    def purchase_card(self, card_class, seat):
+        index = CARD_INDEX[card_class]
+        bit = 1 << index
+        if not self.available_mask(seat) & bit:
+            raise RuntimeError("Tried to buy a card that isn't available!")
+
+        if COSTS[index] <= self.balances[seat]:
+            if index in LANDMARK_INDEXES:
+                self.landmark_masks[seat] &= ~bit
+            else:
+                self.supply[index] -= 1
+                if not self.supply[index]:
+                    self.establishment_mask &= ~bit
+            self.hands[seat][index] += 1
+            self.balances[seat] -= COSTS[index]
+
+    def roll(self):
+        """Throw the dice for the active player. Return a (number, was_double) tuple."""
+        first_roll = self.dice.roll()
+        if self.has_any(self.active, DOUBLE_ROLL):
+            second_roll = self.dice.roll()
+            return first_roll + second_roll, first_roll == second_roll
+        return first_roll, False
+
+    def earn(self, roll_number):
+        """Pay out every card that matches the roll, active player first."""
+        active, inactive = self.active, 1 - self.active
+        self.collect(active, inactive, OWN_TURN, roll_number)
+        self.collect(inactive, active, OFF_TURN, roll_number)
+
+    def collect(self, seat, opponent, table, roll_number):
+        hand = self.hands[seat]
+        income, multipliers, steals = (table["income"][roll_number],
+                                       table["multipliers"][roll_number],
+                                       table["steals"][roll_number])
+        has_bonus = self.has_any(seat, CAFE_BONUS)
+        earned = 0
+        for index, reward, bonus in income:
+            earned += hand[index] * (reward + bonus * has_bonus)
+        for index, multiplied, multiply_by in multipliers:
+            earned += hand[index] * multiply_by * sum(hand[other] for other in multiplied)
+        stolen = 0
+        for index, reward, bonus in steals:
+            stolen += hand[index] * (reward + bonus * has_bonus)
+        # Each card takes what it can, so the total is capped by the opponent's balance.
+        stolen = min(stolen, self.balances[opponent])
+        self.balances[seat] += earned + stolen
+        self.balances[opponent] -= stolen
+        for index in table["trades"][roll_number]:
+            for _ in range(hand[index]):
+                self.trade(seat, opponent, SYMBOLS[index])
+
+    def trade(self, seat, opponent, symbol):
+        """Swap the owner's least favorite tradable card for the opponent's favorite."""
+        player = self.players[seat]
+        my_tradables = self.find_tradables(seat, symbol)
+        their_tradables = self.find_tradables(opponent, symbol)
+        if my_tradables and their_tradables:
+            to_give = min(my_tradables, key=lambda index: player[ALL_CARDS[index]])
+            to_get = max(their_tradables, key=lambda index: player[ALL_CARDS[index]])
+            self.hands[seat][to_give] -= 1
+            self.hands[opponent][to_give] += 1
+            self.hands[opponent][to_get] -= 1
+            self.hands[seat][to_get] += 1
+
+    def find_tradables(self, seat, symbol):
+        return [index for index, count in enumerate(self.hands[seat])
+                if count and SYMBOLS[index] is not symbol]
+
+    def has_won(self, seat):
+        hand = self.hands[seat]
+        return all(hand[index] for index in LANDMARK_INDEXES)
+
+    def simulate_round(self):
+        """Perform roll, earn, and construct stages of a round."""
+        self.turns += 1
+        roll_number, was_double = self.roll()
+        self.earn(roll_number)
+
+        card_class = self.active_player.construct_from_mask(self.available_mask(self.active))
+        if card_class:
+            self.purchase_card(card_class, self.active)
+
+        if self.has_won(self.active):
+            self.winner = self.active_player
+
+        if not (was_double and self.has_any(self.active, EXTRA_TURN)):
+            self.active = 1 - self.active
+
+    def simulate(self):
+        while not self.winner:
+            self.simulate_round()
@@ -4,26 +4,55 @@ evolution.py
 @author Elliot Penson
 """
 
-from random import random, choice
-from itertools import combinations
+from random import random, getrandbits, getstate, setstate, seed as seed_python_random
+from itertools import combinations, accumulate
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
 import csv
 
 import numpy
 from progress.bar import ChargingBar
 
-from embark.machi_koro import Game, Player, ALL_CARDS
+from embark import analytics, checkpoint
+from embark.archive import ArchiveWriter
+from embark.batch import GameBatch
+from embark.dice import Dice
+from embark.machi_koro import Game, GamePool, Player, ALL_CARDS, CARD_INDEX, cards_to_mask
+from embark.match_cache import chromosome_key
+from embark.profiling import Profiler
+from embark.results_log import ResultsLog
+from embark.trace import Recorder
 from embark.parameters import (NUMBER_OF_ROUNDS, GENERATION_SIZE, RECOMBINATION_PROBABILITY,
-                               MUTATION_PROBABILITY, MUTATION_GAUSSIAN_WIDTH)
+                               MUTATION_PROBABILITY, MUTATION_GAUSSIAN_WIDTH, WORKERS, OPPONENTS,
+                               CHECKPOINT_INTERVAL, SELECTION, ADAPTIVE, ADAPTIVE_GAMES_PER_ROUND,
+                               TABLE_SIZE, TABLE_ROUNDS, CULL_FRACTION, BASELINE_INTERVAL,
+                               BASELINE_GAMES, TRACE_SAMPLE_EVERY)
+from embark.rating import INITIAL_RATING, update_ratings, strength, wilson_interval
+
+# Pairings played with one random stream. Changing this changes the results for a given seed.
+PAIRINGS_PER_BLOCK = 250
+
+# Purchase tables an Organism keeps, one per availability mask it has seen most recently.
+PURCHASE_TABLES_PER_ORGANISM = 64
 
 
 class Organism(Player):
 
-    def __init__(self, chromosome):
+    def __init__(self, chromosome=None, genes=None):
         """Create an AI that plays Machi Koro by referencing a gene dictionary (card
         class -> probability of purchase).
+
+        :param genes: Instead of a chromosome, an array of genes in ALL_CARDS order. This is
+            usually a row of a population matrix, which the Organism views rather than copies.
         """
-        self.chromosome = chromosome
+        if genes is None:
+            genes = numpy.array([chromosome[card] for card in ALL_CARDS], dtype=float)
+        self.genes = genes
         self.wins = 0
+        self.rating = INITIAL_RATING
+        self.fitness = 0
+        self.purchase_tables = OrderedDict()  # availability mask -> (cards, cumulative genes)
 
     def choose_favorite_card(self, cards):
         return max(cards, key=lambda card: self[card.__class__])
@@ -33,99 +62,517 @@ class Organism(Player):
         
     def construct(self, available):
         """Sample from this player's genes to select and purchase a card."""
-        relevant_genes = {card_class: probability
-                          for card_class, probability in self.chromosome.items()
-                          if card_class in available}
-        return select_card(relevant_genes)
+        return self.construct_from_mask(cards_to_mask(available))
+
+    def construct_from_mask(self, mask):
+        """Sample a card from the availability mask with a single uniform draw. Cards are chosen
+        with probability proportional to their genes, or uniformly if all of their genes are zero.
+        """
+        if mask in self.purchase_tables:
+            self.purchase_tables.move_to_end(mask)
+            cards, cumulative = self.purchase_tables[mask]
+        else:
+            cards, cumulative = self.purchase_tables[mask] = self.make_purchase_table(mask)
+            if len(self.purchase_tables) > PURCHASE_TABLES_PER_ORGANISM:
+                self.purchase_tables.popitem(last=False)  # Forget the least recently used.
+        index = bisect_right(cumulative, random() * cumulative[-1])
+        return cards[min(index, len(cards) - 1)]
+
+    def make_purchase_table(self, mask):
+        cards = [card for card in ALL_CARDS if mask >> CARD_INDEX[card] & 1]
+        genes = [self[card] for card in cards]
+        if sum(genes) == 0:
+            genes = [1] * len(cards)  # Choose an arbitrary card.
+        return cards, list(accumulate(genes))
+
+    @property
+    def chromosome(self):
+        return dict(zip(ALL_CARDS, self.genes.tolist()))
 
     def __getitem__(self, card):
-        return self.chromosome[card]
+        return self.genes.item(CARD_INDEX[card])
 
     def __setitem__(self, card, probability):
-        self.chromosome[card] = probability
+        self.genes[CARD_INDEX[card]] = probability
+        self.purchase_tables.clear()
 
     def get_genes(self):
-        return self.chromosome.keys()
-
+        return ALL_CARDS
+
+
+def run(rounds=NUMBER_OF_ROUNDS, size=GENERATION_SIZE, seed=None, checkpoint_path=None,
+        checkpoint_interval=CHECKPOINT_INTERVAL, resume_path=None, profile=False,
+        results_path=None, archive_path=None, baselines_path=None,
+        baseline_interval=BASELINE_INTERVAL, baseline_games=BASELINE_GAMES, trace_path=None,
+        trace_sample_every=TRACE_SAMPLE_EVERY, **fitness_options):
+    """Evolve a generation of Organisms. Extra keyword arguments are passed along to iterate.
+
+    :param seed: Seed for the random and numpy.random modules
+    :param checkpoint_path: File that the generation is saved to every checkpoint_interval rounds
+    :param resume_path: Checkpoint to continue from. Given the same options, the run continues
+        exactly as if it had never stopped (as long as no match cache is used, since its contents
+        aren't saved).
+    :param profile: Time the phases of every game and print a summary at the end
+    :param results_path: CSV file that every generation's organisms are appended to (see
+        results_log.ResultsLog). Rows from the starting round on are replaced.
+    :param archive_path: Directory that every generation is archived to in memory-mappable
+        .npy files (see archive.ArchiveWriter). Generations after the starting round are
+        replaced.
+    :param baselines_path: CSV file that the win rates of the fittest organism against the
+        reference strategies of baselines.py are appended to every baseline_interval rounds,
+        from baseline_games games against each. The games are played in a separate pool with the
+        same number of workers while evolution continues (see baselines.BaselineMonitor).
+    :param trace_path: File that one in every trace_sample_every fitness games is recorded to
+        (see trace.Recorder). Recording needs the Game engine and a single worker.
+    """
+    if profile:
+        fitness_options["profiler"] = Profiler()
+    if resume_path:
+        population, start = checkpoint.load(resume_path)
+        generation = from_matrix(population.astype(float))
+        print(f"Resuming evolution with {len(generation)} organisms at round {start}.")
+    else:
+        if seed is not None:
+            seed_python_random(seed)
+            numpy.random.seed(seed)
+        generation = [Organism(make_random_chromosome()) for _ in range(size)]
+        start = 0
+        print(f"Performing evolution with {size} organisms for {rounds} rounds.")
+    results_log = ResultsLog(results_path) if results_path else None
+    if results_log:
+        # Drop rows written after the checkpoint being resumed, so they aren't repeated.
+        results_log.truncate(start)
+    archive = ArchiveWriter(archive_path) if archive_path else None
+    if archive:
+        archive.truncate(start)
+    workers = fitness_options.setdefault("workers", WORKERS)
+    monitor = None
+    if baselines_path:
+        from embark.baselines import BaselineMonitor  # Imports this module.
+        monitor = BaselineMonitor(baselines_path, baseline_games, workers, seed=seed)
+    if trace_path:
+        fitness_options["recorder"] = Recorder(trace_path, trace_sample_every)
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        # One pool for the whole run, so worker processes start once rather than every round.
+        pool = fitness_options["pool"] = ProcessPoolExecutor(workers)
+    try:
+        for round_index in ChargingBar("Iterating").iter(list(range(start, rounds))):
+            parents = generation
+            # Draw each round's fitness seed from the global state, so checkpoints capture it.
+            generation = list(iterate(parents, seed=getrandbits(64), **fitness_options))
+            if results_log:
+                results_log.write(round_index, parents)
+            if archive:
+                archive.write(round_index, parents)
+            if monitor and (round_index + 1) % baseline_interval == 0:
+                champion = max(parents, key=lambda organism: organism.fitness)
+                monitor.submit(round_index, champion.genes)
+            if checkpoint_path and (round_index + 1) % checkpoint_interval == 0:
+                if results_log:
+                    # Write out every generation the checkpoint covers.
+                    results_log.flush()
+                if archive:
+                    archive.flush()
+                checkpoint.save(checkpoint_path, to_matrix(generation), round_index + 1)
+            if profile:
+                fitness_options["profiler"].end_generation()
+    finally:
+        if pool:
+            pool.shutdown()
+        if trace_path:
+            fitness_options["recorder"].close()
+        # Write out the generations played so far, even if the run stopped early.
+        if results_log:
+            results_log.flush()
+        if archive:
+            archive.flush()
+        if monitor:
+            # Waits for the evaluations that are still running.
+            monitor.close()
+    if profile:
+        print(fitness_options["profiler"].summary())
+    return max(generation, key=lambda organism: organism.fitness)
+
+
+def iterate(generation, selection=SELECTION, cull=CULL_FRACTION,
+            recombination_probability=RECOMBINATION_PROBABILITY,
+            mutation_probability=MUTATION_PROBABILITY, mutation_width=MUTATION_GAUSSIAN_WIDTH,
+            **fitness_options):
+    """Form a new generation from an old generation. Choose parents by fitness-proportionate
+    selection. The children are views over the rows of one population matrix.
 
-def run():
-    print(f"Performing evolution with {GENERATION_SIZE} organisms for {NUMBER_OF_ROUNDS} rounds.")
-    generation = {Organism(make_random_chromosome()) for _ in range(GENERATION_SIZE)}
-    for _ in ChargingBar("Iterating").iter(list(range(NUMBER_OF_ROUNDS))):
-        generation = set(iterate(generation))
-    return max(generation, key=lambda organism: organism.wins)
+    :param generation: List of Organisms
+    :param selection: "roulette" to draw every parent independently, or "sus" for stochastic
+        universal sampling
+    :param cull: Fraction of bred children discarded for the worst surrogate fitness (see
+        analytics.surrogate_fitness), so that hopeless strategies never play a game
+    :param recombination_probability: Chance that a child takes each gene from its first parent
+    :param mutation_probability: Chance that a child is mutated
+    :param mutation_width: Standard deviation of the noise added by a mutation
+    :param fitness_options: Keyword arguments for set_fitness
+    """
+    if not 0 <= cull < 1:
+        raise ValueError(f"The cull fraction must be at least 0 and below 1, not {cull}.")
+    set_fitness(generation, **fitness_options)
+    population = to_matrix(generation)
+    fitness = numpy.array([organism.fitness for organism in generation], dtype=float)
+    n_children = int(numpy.ceil(len(generation) / (1 - cull)))
+    parents = select_parents(fitness, 2 * n_children, selection)
+    children = crossover(population[parents[0::2]], population[parents[1::2]],
+                         recombination_probability)
+    mutating = numpy.random.random_sample(len(children)) < mutation_probability
+    children = normalize_rows(mutate_rows(children, mutating, mutation_width))
+    if n_children > len(generation):
+        children = children[analytics.cull(children, len(generation))]
+    return from_matrix(children)
+
+
+def select_parents(fitness, n_parents, selection=SELECTION):
+    """Draw indexes of parents in proportion to their fitness, all in one call. Every organism is
+    equally likely when no organism has any fitness.
+    """
+    total = fitness.sum()
+    weights = fitness / total if total > 0 else numpy.full(len(fitness), 1 / len(fitness))
+    if selection == "roulette":
+        return numpy.random.choice(len(fitness), size=n_parents, p=weights)
+    if selection == "sus":
+        # Evenly spaced pointers with a single random offset. Shuffle them so that consecutive
+        # parents, which breed together, aren't neighbours in the population.
+        pointers = (numpy.random.random_sample() + numpy.arange(n_parents)) / n_parents
+        parents = numpy.searchsorted(numpy.cumsum(weights), pointers, side="right")
+        parents = numpy.minimum(parents, len(fitness) - 1)  # Guard against rounding.
+        numpy.random.shuffle(parents)
+        return parents
+    raise ValueError(f"Unknown selection {selection!r}, expected \"roulette\" or \"sus\".")
+
+
+def crossover(first_parents, second_parents, probability=RECOMBINATION_PROBABILITY):
+    """Use uniform crossover to produce a row of child genes from each pair of parent rows. Each
+    gene comes from the first parent with the given probability.
+    """
+    from_first = numpy.random.random_sample(first_parents.shape) < probability
+    return numpy.where(from_first, first_parents, second_parents)
 
 
-def iterate(generation):
-    """Form a new generation from an old generation. Choose parents by fitness-proportionate
-    selection.
+def mutate_rows(population, mutating, width=MUTATION_GAUSSIAN_WIDTH):
+    """Add noise from a Gaussian random variable to about one gene in each mutating row, keeping
+    every gene within [0, 1].
 
-    :param generation: List of Organisms
+    :param mutating: Boolean array that is True for the rows to mutate
+    :param width: Standard deviation of the noise
     """
-    set_fitness(generation)
-    total_fitness = sum(organism.wins for organism in generation)
-    weights = {organism: organism.wins / total_fitness for organism in generation}
-    for _ in range(GENERATION_SIZE):
-        parent1, parent2 = sample_by_probability(weights, 2)
-        child = breed(parent1, parent2)
-        if random() < MUTATION_PROBABILITY:
-            mutate(child)
-        yield child
+    n_genes = population.shape[1]
+    chosen = (numpy.random.random_sample(population.shape) < 1 / n_genes) & mutating[:, None]
+    noise = numpy.random.normal(0, width, population.shape)
+    return numpy.clip(population + chosen * noise, 0, 1)
+
+
+def normalize_rows(population):
+    """Make the genes in each row sum to one. Rows without any genes are left alone."""
+    totals = population.sum(axis=1, keepdims=True)
+    return population / numpy.where(totals > 0, totals, 1)
 
 
 def breed(parent1, parent2):
     """Use uniform crossover to produce a child from two parent organisms."""
-    chromosome = {card: parent1[card] if random() < RECOMBINATION_PROBABILITY else parent2[card]
-                  for card in ALL_CARDS}
-    return Organism(chromosome)
+    return Organism(genes=crossover(parent1.genes, parent2.genes))
 
 
 def mutate(organism):
     """Add noise from a Gaussian random variable to a chosen gene."""
-    genes = organism.get_genes()
-    for card in genes:
-        if random() < 1 / len(genes):
-            # Mutate one gene on average.
-            organism[card] += numpy.random.normal(0, MUTATION_GAUSSIAN_WIDTH)
-
-            # Ensure 0 <= probability <= 1.
-            if organism[card] > 1:
-                organism[card] = 1
-            elif organism[card] < 0:
-                organism[card] = 0
-
-
-def set_fitness(generation):
-    """Simulate Machi Koro games to find a win rate for a list of Organisms."""
+    organism.genes[:] = mutate_rows(organism.genes[None, :], numpy.ones(1, dtype=bool))[0]
+    organism.purchase_tables.clear()
+
+
+def to_matrix(generation):
+    """Stack the genes of a list of Organisms into a (population x len(ALL_CARDS)) array."""
+    return numpy.array([organism.genes for organism in generation], dtype=float)
+
+
+def from_matrix(population):
+    """Make an Organism that views each row of a population matrix."""
+    return [Organism(genes=genes) for genes in population]
+
+
+def set_fitness(generation, engine=Game, workers=WORKERS, seed=None, opponents=OPPONENTS,
+                cache=None, profiler=None, adaptive=ADAPTIVE, table_size=TABLE_SIZE,
+                table_rounds=TABLE_ROUNDS, pool=None, recorder=None):
+    """Simulate Machi Koro games to find a win rate for a list of Organisms. Fitness is the number
+    of wins in a full round robin or, when opponents are sampled, the strength of an Elo rating.
+    In adaptive mode, fitness is the win rate found by set_adaptive_fitness. With tables of more
+    than two players, fitness is the win rate over table_rounds shuffled tables.
+
+    :param engine: The game class used to play each pairing (Game or engine.FastGame), or
+        batch.GameBatch to play many pairings at once
+    :param workers: Number of processes that play games
+    :param pool: A concurrent.futures.ProcessPoolExecutor of that many workers to play in, so
+        that processes are started once rather than on every call
+    :param seed: Seed for the games' random streams. Fitness depends on the seed, but not on
+        the number of workers.
+    :param opponents: Number of opponents sampled for each Organism, or None to play everyone
+    :param cache: A match_cache.MatchCache. Matchups the cache has seen min_games times aren't
+        played again, and their players score their average result instead of a win or a loss.
+    :param profiler: A profiling.Profiler that collects timings from every game (Game only)
+    :param recorder: A trace.Recorder that samples games to record (Game and one worker only)
+    :param adaptive: Play games in rounds with set_adaptive_fitness. Opponents then sets the
+        number of opponents per round.
+    :param table_size: Players per game, from two to four. Tables of three or four need the
+        Game engine and can't be combined with a cache or adaptive mode.
+    """
+    generation = list(generation)
     for player in generation:
         player.wins = 0  # Reset win rates.
-    for player1, player2 in combinations(generation, 2):
-        game = Game(player1, player2)
-        game.simulate()
-        if game.winner == player1:
-            player1.wins += 1
+        player.games = 0
+        player.rating = INITIAL_RATING
+    chromosomes = to_matrix(generation).tolist()
+    if table_size > 2:
+        if cache is not None or adaptive:
+            raise ValueError("Tables of more than two players can't use a cache or adaptive mode.")
+        tables = sample_tables(len(generation), table_size, table_rounds,
+                               numpy.random.default_rng(seed))
+        seats = play_tables(chromosomes, tables, engine, workers, seed, profiler, pool,
+                            recorder)
+        for table, seat in zip(tables, seats):
+            for index in table:
+                generation[index].games += 1
+            generation[table[seat]].wins += 1
+        for player in generation:
+            player.fitness = player.wins / player.games
+        return
+
+    def play(pairings, seed):
+        if cache is None:
+            scores = play_pairings(chromosomes, pairings, engine, workers, seed, profiler, pool,
+                                   recorder)
         else:
-            player2.wins += 1
+            scores = play_cached_pairings(chromosomes, pairings, cache, engine, workers, seed,
+                                          profiler, pool, recorder)
+        for (first, second), score in zip(pairings, scores):
+            player, opponent = generation[first], generation[second]
+            player.wins += score
+            opponent.wins += 1 - score
+            player.games += 1
+            opponent.games += 1
+            update_ratings(player, opponent, score)
+
+    if adaptive:
+        set_adaptive_fitness(generation, play, numpy.random.default_rng(seed),
+                             opponents or ADAPTIVE_GAMES_PER_ROUND)
+        return
+    if opponents is None:
+        pairings = list(combinations(range(len(generation)), 2))
+    else:
+        pairings = sample_pairings(len(generation), opponents, numpy.random.default_rng(seed))
+    play(pairings, seed)
+    for player in generation:
+        player.fitness = player.wins if opponents is None else strength(player.rating)
+
+
+def set_adaptive_fitness(generation, play, rng, opponents=ADAPTIVE_GAMES_PER_ROUND,
+                         budget=None):
+    """Find win rates by successive halving. Each round, every contender plays a number of
+    sampled opponents. A contender drops out once the Wilson interval of its win rate lies
+    entirely below the interval of the contender ranked at the halfway mark, since more games
+    wouldn't move it into the top half. The remaining games go to the closest contenders at the
+    top, which is where selection is decided. Fitness is the win rate.
+
+    :param play: Function that plays a list of (first, second) index pairings with a seed and
+        adds the results to the Organisms' wins and games
+    :param rng: A numpy.random.Generator for opponents and the seed of each round
+    :param budget: Most games to play, which defaults to the size of a full round robin (or one
+        game per organism, if that is more). Rounds are shortened to fit the budget, but the
+        first round always gives every organism at least one game.
+    """
+    if budget is None:
+        budget = max(len(generation) * (len(generation) - 1) // 2, len(generation))
+    contenders = list(range(len(generation)))
+    if len(contenders) > 1 and budget < len(contenders):
+        raise ValueError(f"A budget of {budget} games can't give each of {len(contenders)} "
+                         f"organisms a game.")
+    opponents = min(opponents, len(generation) - 1)
+    played = 0
+    while len(contenders) > 1:
+        round_opponents = min(opponents, (budget - played) // len(contenders))
+        if round_opponents == 0:
+            break
+        pairings = sample_pairings(len(generation), round_opponents, rng, contenders)
+        play(pairings, int(rng.integers(2 ** 63)))
+        played += len(pairings)
+        intervals = {index: wilson_interval(generation[index].wins, generation[index].games)
+                     for index in contenders}
+        contenders.sort(key=lambda index: generation[index].wins / generation[index].games,
+                        reverse=True)
+        halfway_low, _ = intervals[contenders[(len(contenders) - 1) // 2]]
+        contenders = [index for index in contenders if intervals[index][1] >= halfway_low]
+    for player in generation:
+        player.fitness = player.wins / player.games if player.games else 0
 
 
-def select_card(chromosome):
-    """Choose a card by referencing a strategy. The genes parameter is a dictionary from card class
-    -> probability of selection.
+def sample_tables(n_organisms, table_size, rounds, rng):
+    """Shuffle organism indexes into tables of table_size, once per round. When the organisms
+    don't divide evenly, the last table of a round is filled with other organisms, who play an
+    extra game.
+    """
+    if n_organisms < table_size:
+        raise ValueError(f"Can't fill a table of {table_size} with {n_organisms} organisms.")
+    tables = []
+    for _ in range(rounds):
+        order = rng.permutation(n_organisms).tolist()
+        for start in range(0, n_organisms, table_size):
+            table = order[start:start + table_size]
+            if len(table) < table_size:
+                others = [index for index in range(n_organisms) if index not in table]
+                fillers = rng.choice(others, size=table_size - len(table), replace=False)
+                table += fillers.tolist()
+            tables.append(tuple(table))
+    return tables
+
+
+def sample_pairings(n_organisms, opponents, rng, players=None):
+    """Pair each organism index (or each index in players) with a number of distinct, randomly
+    chosen opponents.
+    """
+    pairings = []
+    for first in range(n_organisms) if players is None else players:
+        for second in rng.choice(n_organisms - 1, size=opponents, replace=False):
+            # Skip over the organism itself.
+            pairings.append((first, int(second) + (second >= first)))
+    return pairings
+
+
+def play_cached_pairings(chromosomes, pairings, cache, engine=Game, workers=1, seed=None,
+                         profiler=None, pool=None, recorder=None):
+    """Like play_pairings, but look up each matchup in a MatchCache first. Matchups the cache
+    can't answer yet are played once per call, however often they appear, and their results are
+    added to the cache. Return the first player's score for each pairing.
     """
-    if sum(chromosome.values()) == 0:
-        return choice(list(chromosome))  # Choose an arbitrary card.
+    keys = [cache.intern(chromosome_key(genes)) for genes in chromosomes]
+    scores = [cache.score(keys[first], keys[second]) for first, second in pairings]
+    unplayed = {}  # (key1, key2) -> pairing
+    for pairing, score in zip(pairings, scores):
+        first, second = pairing
+        matchup = keys[first], keys[second]
+        if score is None and matchup not in unplayed and matchup[::-1] not in unplayed:
+            unplayed[matchup] = pairing
+    results = dict(zip(unplayed, play_pairings(chromosomes, list(unplayed.values()), engine,
+                                               workers, seed, profiler, pool, recorder)))
+    for (key1, key2), first_won in results.items():
+        cache.record(key1, key2, first_won)
+    for index, (first, second) in enumerate(pairings):
+        if scores[index] is None:
+            matchup = keys[first], keys[second]
+            if matchup in results:
+                scores[index] = int(results[matchup])
+            else:
+                scores[index] = 1 - results[matchup[::-1]]
+    return scores
+
+
+def play_pairings(chromosomes, pairings, engine=Game, workers=1, seed=None, profiler=None,
+                  pool=None, recorder=None):
+    """Play one game for each (first, second) pair of chromosome indexes. Return a list that
+    holds True where the first player won.
+    """
+    return [seat == 0 for seat in play_tables(chromosomes, pairings, engine, workers, seed,
+                                              profiler, pool, recorder)]
 
-    chromosome = normalize(chromosome)
-    return sample_by_probability(chromosome)
 
+def play_tables(chromosomes, tables, engine=Game, workers=1, seed=None, profiler=None,
+                pool=None, recorder=None):
+    """Play one game for each tuple of chromosome indexes, seated in order. Tables are split into
+    fixed-size blocks that each get their own random stream, so blocks can be handed to any
+    worker process. Return the seat of the winner of each game.
 
-def sample_by_probability(probability_dict, n_samples=None):
-    """Randomly choose a key from a dict by the weight of its value. The sum of dict values should
-    equal one.
+    :param pool: A concurrent.futures.Executor that plays the blocks. Without one, a pool of
+        worker processes is started for this call when there is more than one worker.
+    :param recorder: A trace.Recorder for the games. Its file belongs to this process, so the
+        games must be played here, with one worker and no pool.
+    """
+    if recorder and (workers > 1 or pool is not None):
+        raise ValueError("Games can only be recorded with a single worker.")
+    blocks = [tables[start:start + PAIRINGS_PER_BLOCK]
+              for start in range(0, len(tables), PAIRINGS_PER_BLOCK)]
+    seeds = numpy.random.SeedSequence(seed).spawn(len(blocks))
+    arguments = [[chromosomes] * len(blocks), blocks, seeds, [engine] * len(blocks),
+                 [profiler is not None] * len(blocks), [recorder] * len(blocks)]
+    if pool is not None:
+        block_results = pool.map(play_block, *arguments)
+    elif workers > 1:
+        # Imported here, since starting up multiprocessing is slow and often not needed.
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            block_results = list(pool.map(play_block, *arguments))
+    else:
+        block_results = map(play_block, *arguments)
+    all_results = []
+    for results, statistics in block_results:
+        all_results.extend(results)
+        if profiler:
+            profiler.merge(statistics)
+    return all_results
+
+
+def play_block(chromosomes, tables, seed, engine=Game, profile=False, recorder=None):
+    """Play a block of tables (see play_tables) with random streams derived from a
+    numpy.random.SeedSequence. Return the winning seats and, when profiling, the statistics of a
+    Profiler.
+    """
+    organisms = from_matrix(numpy.array(chromosomes, dtype=float))
+    pairs = [tuple(organisms[index] for index in table) for table in tables]
+    profiler = Profiler() if profile else None
+    # Dice have their own streams, but Organisms draw purchases from the random module.
+    with seeded_random(seed):
+        winners = play_pairs(pairs, engine, seed, profiler, recorder)
+    seats = [players.index(winner) for players, winner in zip(pairs, winners)]
+    return seats, profiler.get_statistics() if profiler else None
+
+
+def play_pairs(pairs, engine=Game, seed=None, profiler=None, recorder=None):
+    """Play one game for each tuple of players, which may hold up to four players when the
+    engine is Game. Return a list of winners.
+
+    :param seed: A numpy.random.SeedSequence. Each game rolls dice from its own child sequence.
+    :param profiler: A profiling.Profiler given to each game. Only Game supports profiling.
+    :param recorder: A trace.Recorder given to each game (Game only)
     """
-    return numpy.random.choice(list(probability_dict.keys()),
-                               size=n_samples,
-                               p=list(probability_dict.values()))
+    if profiler and engine is not Game:
+        raise ValueError(f"{engine.__name__} can't be profiled.")
+    if recorder and engine is not Game:
+        raise ValueError(f"{engine.__name__} can't be recorded.")
+    if engine is not Game and any(len(players) > 2 for players in pairs):
+        raise ValueError(f"{engine.__name__} only plays two-player games.")
+    if seed is None:
+        seed = numpy.random.SeedSequence()
+    if engine is GameBatch:
+        batch = GameBatch(pairs, numpy.random.default_rng(seed))
+        batch.simulate()
+        return batch.winners
+    winners = []
+    pool = GamePool(engine)
+    for (player1, player2, *others), game_seed in zip(pairs, seed.spawn(len(pairs))):
+        game = pool.acquire(player1, player2, Dice(game_seed), others)
+        game.profiler = profiler
+        game.recorder = recorder
+        game.simulate()
+        winners.append(game.winner)
+        pool.release(game)
+    return winners
+
+
+@contextmanager
+def seeded_random(seed_sequence):
+    """Temporarily seed the random and numpy.random modules from a numpy.random.SeedSequence."""
+    python_state, numpy_state = getstate(), numpy.random.get_state()
+    python_seed, numpy_seed = seed_sequence.generate_state(2)
+    seed_python_random(int(python_seed))
+    numpy.random.seed(numpy_seed)
+    try:
+        yield
+    finally:
+        setstate(python_state)
+        numpy.random.set_state(numpy_state)
 
 
 def normalize(chromosome):
@@ -158,3 +605,17 @@ def export(generation, file_name="report.csv"):
         report.writerow(["Wins"] + [card.__name__ for card in ALL_CARDS])
         for organism in generation:
             report.writerow([organism.wins] + [organism[card] for card in ALL_CARDS])
+
+
+def load_organisms(file_name):
+    """Read a report written by export. Return a dict of organism name -> genes in
+    ALL_CARDS order. Organisms are named by their row, and the one with the most wins is also
+    called "best".
+    """
+    with open(file_name, newline="") as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    organisms = {str(index): [float(row[card.__name__]) for card in ALL_CARDS]
+                 for index, row in enumerate(rows)}
+    best = max(range(len(rows)), key=lambda index: float(rows[index]["Wins"]))
+    organisms["best"] = organisms[str(best)]
+    return organisms
@@ -0,0 +1,110 @@
+"""
+islands.py
+
+Evolve several sub-populations in parallel, moving a few of the fittest organisms between
+them every so often.
+
+@author Elliot Penson
+"""
+
+from random import getrandbits
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+from progress.bar import ChargingBar
+
+from embark.evolution import (Organism, iterate, make_random_chromosome, seeded_random,
+                              to_matrix, from_matrix)
+from embark.parameters import (NUMBER_OF_ROUNDS, GENERATION_SIZE, ISLANDS, MIGRATION_INTERVAL,
+                               MIGRANTS)
+
+TOPOLOGIES = ["ring", "random"]
+
+
+def run(rounds=NUMBER_OF_ROUNDS, size=GENERATION_SIZE, islands=ISLANDS,
+        migration_interval=MIGRATION_INTERVAL, migrants=MIGRANTS, topology="ring", seed=None,
+        processes=None, **fitness_options):
+    """Evolve islands of Organisms, each in its own process. Every migration_interval rounds the
+    fittest organisms of each island replace some of the children on another island. Extra
+    keyword arguments are passed along to iterate and from there to set_fitness, whose workers
+    should stay at one, since every island already has a process. Return the fittest organism
+    across all islands.
+
+    :param size: Number of organisms on each island
+    :param topology: "ring" sends migrants to the next island, "random" to any other island
+    :param seed: Seed for the whole run. Results don't depend on the number of processes.
+    :param processes: Number of processes, which defaults to one per island
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology {topology!r}, expected one of {TOPOLOGIES}.")
+    seed_sequence = numpy.random.SeedSequence(seed)
+    island_seeds = seed_sequence.spawn(islands)
+    rng = numpy.random.default_rng(seed_sequence.spawn(1)[0])
+    populations = [None] * islands  # None asks an island to start from random chromosomes.
+    parents = []
+    print(f"Performing evolution on {islands} islands of {size} organisms for {rounds} rounds.")
+    with ProcessPoolExecutor(processes or islands) as pool:
+        for start in ChargingBar("Migrating").iter(list(range(0, rounds, migration_interval))):
+            epoch_rounds = min(migration_interval, rounds - start)
+            epoch_seeds = [island_seed.spawn(1)[0] for island_seed in island_seeds]
+            results = list(pool.map(evolve_island, populations, [size] * islands,
+                                    [epoch_rounds] * islands, epoch_seeds,
+                                    [fitness_options] * islands))
+            populations = [children for children, _ in results]
+            parents = [island_parents for _, island_parents in results]
+            migrate(populations, parents, migrants, destinations(islands, topology, rng))
+    if not parents:
+        # No rounds were played, so no organism has a fitness yet.
+        with seeded_random(seed_sequence.spawn(1)[0]):
+            return Organism(make_random_chromosome())
+    champion_genes, _, champion_fitness = max(
+        (organism for island_parents in parents for organism in island_parents),
+        key=lambda organism: organism[2])
+    champion = Organism(genes=numpy.array(champion_genes))
+    champion.fitness = champion_fitness
+    return champion
+
+
+def evolve_island(population, size, rounds, seed, fitness_options):
+    """Iterate one island for a number of rounds, with the random and numpy.random modules seeded
+    from a numpy.random.SeedSequence.
+
+    :param population: List of gene lists, or None to start with random chromosomes
+    :return: The genes of the last children, and (genes, wins, fitness) of their parents
+    """
+    with seeded_random(seed):
+        if population is None:
+            generation = [Organism(make_random_chromosome()) for _ in range(size)]
+        else:
+            generation = from_matrix(numpy.array(population, dtype=float))
+        parents = generation
+        for _ in range(rounds):
+            parents = generation
+            generation = list(iterate(parents, seed=getrandbits(64), **fitness_options))
+    return (to_matrix(generation).tolist(),
+            [(genes, organism.wins, organism.fitness)
+             for genes, organism in zip(to_matrix(parents).tolist(), parents)])
+
+
+def destinations(islands, topology, rng):
+    """Return the island that each island sends its migrants to."""
+    if topology == "ring":
+        return [(island + 1) % islands for island in range(islands)]
+    # Any island but the sender.
+    return [(island + int(rng.integers(1, islands))) % islands if islands > 1 else island
+            for island in range(islands)]
+
+
+def migrate(populations, parents, migrants, targets):
+    """Copy the fittest parents of each island over the last children of its target island.
+    Children are bred independently, so the last ones are as good as any to replace.
+    """
+    arrivals = [[] for _ in populations]
+    for source, target in enumerate(targets):
+        if target != source:
+            fittest = sorted(parents[source], key=lambda organism: organism[2], reverse=True)
+            arrivals[target].extend(genes for genes, _, _ in fittest[:migrants])
+    for population, genes in zip(populations, arrivals):
+        genes = genes[:len(population)]
+        if genes:
+            population[-len(genes):] = genes
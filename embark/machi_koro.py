@@ -5,9 +5,8 @@ machi_koro.py
 """
 
 from collections import Counter
-from random import randint
-
 from embark import cards
+from embark.dice import Dice
 
 ALL_CARDS = [cards.TrainStation, cards.ShoppingMall, cards.AmusementPark, cards.RadioTower,
              cards.WheatField, cards.Ranch, cards.Bakery, cards.Cafe, cards.ConvenienceStore,
@@ -33,60 +32,197 @@ STARTING_ESTABLISHMENTS = {
 }
 STARTING_BALANCE = 3
 LANDMARKS = [cards.TrainStation, cards.ShoppingMall, cards.AmusementPark, cards.RadioTower]
+CARD_INDEX = {card: index for index, card in enumerate(ALL_CARDS)}
+# Number of each card in a starting hand, in ALL_CARDS order.
+STARTING_HAND = tuple(int(card in [cards.WheatField, cards.Bakery]) for card in ALL_CARDS)
+MAX_ROLL = 12
+MAX_PLAYERS = 4
 
 
 class Game:
 
-    def __init__(self, player1, player2):
-        player1.join_game(self)
-        player2.join_game(self)
+    def __init__(self, player1, player2, dice=None, profiler=None, others=(), recorder=None):
+        """Set up a game between two players. Rolls come from the dice, which default to a
+        freshly seeded dice.Dice. If a profiling.Profiler is given, the game reports the time
+        spent in each phase of a round to it. If a trace.Recorder is given, the games it samples
+        are recorded event by event.
+
+        :param others: Up to two more players. Players sit clockwise in the order given, and
+            the turn passes clockwise.
+        """
+        self.profiler = profiler
+        self.recorder = recorder
+        self.players = []
+        self.opponents = {}  # player -> the other players, counter-clockwise
+        self.establishments = Counter()
+        self.landmark_masks = {}
+        self.reset(player1, player2, dice, others)
+
+    def reset(self, player1, player2, dice=None, others=()):
+        """Start a new game in this object, restoring the starting inventory in place."""
+        if len(others) > MAX_PLAYERS - 2:
+            raise ValueError(f"A game has at most {MAX_PLAYERS} players.")
+        self.dice = dice if dice is not None else Dice()
+        self.players[:] = player1, player2, *others
+        self.opponents.clear()
+        self.landmark_masks.clear()
+        for seat, player in enumerate(self.players):
+            player.join_game(self)
+            self.opponents[player] = [self.players[(seat - step) % len(self.players)]
+                                      for step in range(1, len(self.players))]
+            self.landmark_masks[player] = LANDMARK_MASK
+        self.active = 0
         self.active_player = player1
-        self.inactive_player = player2
+        self.inactive_player = player2  # The player whose turn is next.
         self.winner = None
-        self.establishments = Counter(STARTING_ESTABLISHMENTS)
-        self.landmarks = {player1: set(LANDMARKS), player2: set(LANDMARKS)}
+        self.turns = 0
+        self.trace = None
+        for card_class, count in STARTING_ESTABLISHMENTS.items():
+            self.establishments[card_class] = count
+        # Availability is also kept as bitmasks (see cards_to_mask) so that players can cache
+        # decisions by the set of cards on offer.
+        self.establishment_mask = STARTING_ESTABLISHMENT_MASK
+
+    def available_mask(self, player):
+        return self.establishment_mask | self.landmark_masks[player]
 
     def find_available_cards(self, player):
-        return set(self.establishments.elements()) | self.landmarks[player]
+        return mask_to_cards(self.available_mask(player))
 
     def purchase_card(self, card_class, player):
         """A factory method that creates cards and lowers the inventory count."""
-        if card_class not in self.find_available_cards(player):
+        bit = 1 << CARD_INDEX[card_class]
+        if not self.available_mask(player) & bit:
             raise RuntimeError("Tried to buy a card that isn't available!")
 
-        instance = card_class(player, self)
-        if player.has_funds_for(instance):
-            if instance.is_landmark():
-                self.landmarks[player].remove(card_class)
+        if player.has_funds_for(card_class):
+            if card_class.is_landmark():
+                self.landmark_masks[player] &= ~bit
             else:
                 self.establishments[card_class] -= 1
-            player.receive_card(instance)
+                if not self.establishments[card_class]:
+                    self.establishment_mask &= ~bit
+            player.receive_card(card_class(player, self))
+
+    def snapshot(self):
+        """Capture the position as a compact tuple of numbers, which is cheap to make, to keep
+        and to send to other processes. Restore it into this game, or into any game with as many
+        players, with restore. The dice aren't part of a snapshot.
+        """
+        return (self.active, self.turns,
+                tuple(self.establishments[card_class] for card_class in STARTING_ESTABLISHMENTS),
+                self.establishment_mask,
+                tuple((player.balance, player.hand_counts(), self.landmark_masks[player])
+                      for player in self.players))
+
+    def restore(self, snapshot):
+        """Return to a position captured by snapshot. Players get their hands back from card
+        objects they already own where possible, so restoring rarely creates any cards.
+        """
+        active, turns, supply, establishment_mask, seats = snapshot
+        if len(seats) != len(self.players):
+            raise ValueError(f"A snapshot of {len(seats)} players can't be restored into a "
+                             f"game of {len(self.players)}.")
+        for card_class, count in zip(STARTING_ESTABLISHMENTS, supply):
+            self.establishments[card_class] = count
+        self.establishment_mask = establishment_mask
+        for player, (balance, counts, landmark_mask) in zip(self.players, seats):
+            player.restore_hand(counts)
+            player.balance = balance
+            self.landmark_masks[player] = landmark_mask
+        self.active = active
+        self.active_player = self.players[active]
+        self.inactive_player = self.players[(active + 1) % len(self.players)]
+        self.turns = turns
+        self.winner = None
 
     def switch_player(self):
-        self.active_player, self.inactive_player = self.inactive_player, self.active_player
+        """Pass the turn clockwise."""
+        self.active = (self.active + 1) % len(self.players)
+        self.active_player = self.inactive_player
+        self.inactive_player = self.players[(self.active + 1) % len(self.players)]
+
+    def earn(self, roll_number):
+        """Pay out the active player's cards, then the other players' cards counter-clockwise
+        (the order in which restaurants take their coins).
+        """
+        self.active_player.earn(roll_number)
+        for player in self.opponents[self.active_player]:
+            player.earn(roll_number)
+
+    def end_turn(self, was_double):
+        if self.active_player.has_won():
+            self.winner = self.active_player
+
+        if not (was_double and self.active_player.extra_turn_cards):
+            self.switch_player()
 
     def simulate_round(self):
         """Perform roll, earn, and construct stages of a round."""
+        self.turns += 1
         roll_number, was_double = self.active_player.roll()
 
-        self.active_player.earn(roll_number)
-        self.inactive_player.earn(roll_number)
+        self.earn(roll_number)
 
-        available_cards = self.find_available_cards(self.active_player)
-        card_class = self.active_player.construct(available_cards)
+        available_mask = self.available_mask(self.active_player)
+        card_class = self.active_player.construct_from_mask(available_mask)
         if card_class:
             self.purchase_card(card_class, self.active_player)
 
-        if self.active_player.has_won():
-            self.winner = self.active_player
+        self.end_turn(was_double)
 
-        if not (was_double and any(card.gives_extra_turn_on_doubles()
-                                   for card in self.active_player.hand)):
-            self.switch_player()
+    def simulate_profiled_round(self):
+        """Perform a round like simulate_round, timing each stage."""
+        profiler, player = self.profiler, self.active_player
+        self.turns += 1
+        roll_number, was_double = profiler.time("roll", player.roll)
+
+        profiler.time("earn", self.earn, roll_number)
+
+        available_mask = self.available_mask(player)
+        card_class = profiler.time("construct", player.construct_from_mask, available_mask)
+        if card_class:
+            profiler.time("purchase", self.purchase_card, card_class, player)
+
+        self.end_turn(was_double)
+
+    def simulate_traced_round(self):
+        """Perform a round like simulate_round, recording each stage to the game's trace."""
+        trace, player, seat = self.trace, self.active_player, self.active
+        self.turns += 1
+        roll_number, was_double = player.roll()
+        trace.roll(seat)
+
+        self.earn(roll_number)
+        trace.balances()
+
+        card_class = player.construct_from_mask(self.available_mask(player))
+        if card_class:
+            self.purchase_card(card_class, player)
+        trace.purchase(seat, card_class, player.balance)
+
+        self.end_turn(was_double)
+        if self.active == seat:
+            trace.extra_turn(seat)
 
     def simulate(self):
-        while not self.winner:
-            self.simulate_round()
+        self.trace = self.recorder.start_game(self) if self.recorder else None
+        if self.trace:
+            simulate_round = self.simulate_traced_round
+        elif self.profiler:
+            simulate_round = self.simulate_profiled_round
+        else:
+            simulate_round = self.simulate_round
+        try:
+            while not self.winner:
+                simulate_round()
+        finally:
+            if self.trace:
+                # Also gives the game back its dice if a round raised.
+                self.trace.end_game()
+                self.trace = None
+        if self.profiler:
+            self.profiler.end_game(self)
 
 
 class Player:
@@ -95,34 +231,108 @@ class Player:
         self.wins = 0
 
     def join_game(self, game):
+        """Sit down at a game with the starting hand."""
         self.game = game
-        self.hand = [cards.WheatField(self, game), cards.Bakery(self, game)]
+        self.restore_hand(STARTING_HAND)
         self.balance = STARTING_BALANCE
 
+    def restore_hand(self, counts):
+        """Set the hand to a number of each card, in ALL_CARDS order. The player keeps the card
+        objects it has been dealt this way and hands them back out, so cards are only created
+        the first time the player holds that many of a kind.
+        """
+        if not hasattr(self, "dealt_cards"):
+            self.dealt_cards = [[] for _ in ALL_CARDS]
+        hand = []
+        for card_class, dealt, count in zip(ALL_CARDS, self.dealt_cards, counts):
+            while len(dealt) < count:
+                dealt.append(card_class(self, self.game))
+            for card in dealt[:count]:
+                # The card may have been traded away or have belonged to an earlier game.
+                card.owner, card.game = self, self.game
+                hand.append(card)
+        self.hand = hand
+
+    def hand_counts(self):
+        """Return the number of each card in the hand, in ALL_CARDS order."""
+        return tuple(self.card_counts[card_class] for card_class in ALL_CARDS)
+
+    @property
+    def hand(self):
+        return self._hand
+
+    @hand.setter
+    def hand(self, hand):
+        """Replace the hand and rebuild the indexes that add_to_hand and remove_from_hand keep
+        up to date. The indexes are cleared in place rather than allocated again.
+        """
+        if not hasattr(self, "_hand"):
+            self._hand = []
+            self.card_counts = Counter()
+            self.symbol_counts = Counter()
+            self.activations = [[] for _ in range(MAX_ROLL + 1)]  # roll -> cards
+        if hand is self._hand:
+            hand = list(hand)
+        self._hand.clear()
+        self.card_counts.clear()
+        self.symbol_counts.clear()
+        for activated in self.activations:
+            activated.clear()
+        self.landmark_count = 0
+        self.double_roll_cards = 0
+        self.extra_turn_cards = 0
+        self.cafe_bonus_cards = 0
+        for card in hand:
+            self.add_to_hand(card)
+
+    def add_to_hand(self, card):
+        self._hand.append(card)
+        self.index_card(card, 1)
+
+    def remove_from_hand(self, card):
+        self._hand.remove(card)
+        self.index_card(card, -1)
+
+    def index_card(self, card, change):
+        """Count a card entering (change=1) or leaving (change=-1) the hand."""
+        self.card_counts[card.__class__] += change
+        self.symbol_counts[card.symbol] += change
+        self.landmark_count += change * card.is_landmark()
+        self.double_roll_cards += change * card.enables_double_roll()
+        self.extra_turn_cards += change * card.gives_extra_turn_on_doubles()
+        self.cafe_bonus_cards += change * card.gives_cafe_bonus()
+        for roll_number in card.activation:
+            if change > 0:
+                self.activations[roll_number].append(card)
+            else:
+                self.activations[roll_number].remove(card)
+
     def has_won(self):
-        return len([card for card in self.hand if card.is_landmark()]) == len(LANDMARKS)
+        return self.landmark_count == len(LANDMARKS)
 
     def has_card(self, card_class):
-        return any(card.__class__ == card_class for card in self.hand)
+        return self.card_counts[card_class] > 0
 
     def has_funds_for(self, card):
+        """Return whether the player can afford a card or card class."""
         return card.cost <= self.balance
 
     def receive_card(self, card):
-        self.hand.append(card)
+        self.add_to_hand(card)
         self.balance -= card.cost
 
     def roll(self):
         """Throw the dice. Return a (number, was_double) tuple."""
-        first_roll = roll()
-        if any(card.enables_double_roll() for card in self.hand):
-            second_roll = roll()
+        first_roll = self.game.dice.roll()
+        if self.double_roll_cards:
+            second_roll = self.game.dice.roll()
             return first_roll + second_roll, first_roll == second_roll
         return first_roll, False
 
     def earn(self, roll_number):
-        """Tell all card observers about a roll and earn money accordingly."""
-        for card in self.hand:
+        """Tell the card observers that match a roll about it and earn money accordingly."""
+        # Copy the cards, since trading can change the hand during activation.
+        for card in list(self.activations[roll_number]):
             card.notify(roll_number)
 
     def choose_favorite_card(self, cards):
@@ -131,10 +341,57 @@ class Player:
     def choose_least_favorite_card(self, cards):
         raise NotImplementedError()
 
+    def choose_opponent(self, opponents):
+        """Return the opponent that a TV Station takes coins from. Defaults to the richest."""
+        return max(opponents, key=lambda opponent: opponent.balance)
+
     def construct(self, available):
         """Abstract method. Return a card class from the given list."""
         raise NotImplementedError()
 
+    def construct_from_mask(self, mask):
+        """Return a card class from the cards in an availability mask. Subclasses may override
+        this to avoid building a set of cards every turn.
+        """
+        return self.construct(mask_to_cards(mask))
+
+
+def cards_to_mask(card_classes):
+    """Encode a collection of card classes as an integer with one bit per ALL_CARDS index."""
+    mask = 0
+    for card_class in card_classes:
+        mask |= 1 << CARD_INDEX[card_class]
+    return mask
+
+
+def mask_to_cards(mask):
+    return {card for index, card in enumerate(ALL_CARDS) if mask >> index & 1}
+
+
+# The starting availability that Game.reset restores.
+STARTING_ESTABLISHMENT_MASK = cards_to_mask(STARTING_ESTABLISHMENTS)
+LANDMARK_MASK = cards_to_mask(LANDMARKS)
+
+
+class GamePool:
+
+    def __init__(self, engine=Game):
+        """Keep finished games of an engine (Game or engine.FastGame) around to be reset for
+        new players, instead of allocating a new game for every pairing.
+        """
+        self.engine = engine
+        self.free = []
+
+    def acquire(self, player1, player2, dice=None, others=()):
+        """Return a game between the players, reusing a released game if there is one. Only
+        Game takes other players.
+        """
+        table = {"others": others} if others else {}
+        if self.free:
+            game = self.free.pop()
+            game.reset(player1, player2, dice, **table)
+            return game
+        return self.engine(player1, player2, dice, **table)
 
-def roll(number_of_die_faces=6):
-    return randint(1, number_of_die_faces)
+    def release(self, game):
+        self.free.append(game)
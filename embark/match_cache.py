@@ -0,0 +1,71 @@
+"""
+match_cache.py
+
+@author Elliot Penson
+"""
+
+from collections import OrderedDict
+
+from embark.parameters import MATCH_CACHE_SIZE, MATCH_CACHE_MIN_GAMES
+
+# Genes that agree to this many decimal places are treated as the same gene.
+KEY_DIGITS = 9
+
+
+def chromosome_key(genes):
+    """Quantize a list of genes into a hashable key."""
+    return tuple(round(gene, KEY_DIGITS) for gene in genes)
+
+
+class MatchCache:
+
+    def __init__(self, max_size=MATCH_CACHE_SIZE, min_games=MATCH_CACHE_MIN_GAMES):
+        """Remember the results of games between pairs of chromosome keys. A matchup keeps being
+        played, and its results accumulate, until it has min_games games; after that it isn't
+        simulated again and scores its average result. Only the most recently used max_size
+        matchups are kept.
+        """
+        self.max_size = max_size
+        self.min_games = min_games
+        self.matchups = OrderedDict()  # (key1, key2) -> [games, wins for key1]
+        self.interned = {}
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, key):
+        """Return a shared copy of a key. Equal keys are then also identical, which makes
+        comparing them in dictionary lookups cheap.
+        """
+        key = self.interned.setdefault(key, key)
+        if len(self.interned) > self.max_size:
+            self.interned = {key: key}  # Start over rather than grow without bound.
+        return key
+
+    def score(self, key1, key2):
+        """Return the fraction of games won by key1 against key2, or None if the matchup hasn't
+        been played min_games times yet.
+        """
+        matchup, flipped = self.order(key1, key2)
+        if matchup not in self.matchups or self.matchups[matchup][0] < self.min_games:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.matchups.move_to_end(matchup)
+        games, wins = self.matchups[matchup]
+        return 1 - wins / games if flipped else wins / games
+
+    def record(self, key1, key2, first_won):
+        matchup, flipped = self.order(key1, key2)
+        statistics = self.matchups.setdefault(matchup, [0, 0])
+        statistics[0] += 1
+        statistics[1] += first_won != flipped
+        self.matchups.move_to_end(matchup)
+        if len(self.matchups) > self.max_size:
+            self.matchups.popitem(last=False)
+
+    @staticmethod
+    def order(key1, key2):
+        """Store each matchup once, whichever player went first."""
+        if key2 < key1:
+            return (key2, key1), True
+        return (key1, key2), False
@@ -15,3 +15,66 @@ MUTATION_PROBABILITY = 0.25
 
 # The standard deviation the Gaussian distributed used to mutate a single gene.
 MUTATION_GAUSSIAN_WIDTH = 0.01
+
+# Number of processes that play the games used to determine fitness.
+WORKERS = 1
+
+# Number of opponents each organism plays per generation. None plays a full round robin and uses
+# wins as fitness. Otherwise opponents are sampled and organisms are ranked by Elo rating.
+OPPONENTS = None
+
+# Evaluate fitness adaptively (see evolution.set_adaptive_fitness): play matches in rounds and
+# stop playing organisms once they are clearly outside the top half of the contenders.
+ADAPTIVE = False
+
+# Number of sampled opponents each remaining contender plays per adaptive round.
+ADAPTIVE_GAMES_PER_ROUND = 10
+
+# Players per game when measuring fitness. Above two, organisms are shuffled into tables of this
+# size, so that each game scores several organisms at once.
+TABLE_SIZE = 2
+
+# Number of times organisms are shuffled into tables, which is the games each organism plays.
+TABLE_ROUNDS = 25
+
+# Number of matchups between chromosomes whose results are remembered across generations when a
+# match cache is used.
+MATCH_CACHE_SIZE = 100000
+
+# Games a matchup is played, one per generation at most, before the match cache answers it with
+# the average result instead of playing it again.
+MATCH_CACHE_MIN_GAMES = 5
+
+# Number of rounds between checkpoints, when a checkpoint file is given.
+CHECKPOINT_INTERVAL = 10
+
+# Number of generations buffered before a results log is written to disk.
+RESULTS_FLUSH_INTERVAL = 10
+
+# Number of sub-populations evolved side by side in island mode.
+ISLANDS = 4
+
+# Number of rounds between migrations in island mode.
+MIGRATION_INTERVAL = 5
+
+# Number of each island's fittest organisms that migrate to a neighbouring island.
+MIGRANTS = 2
+
+# How parents are chosen in proportion to fitness: "roulette" draws each parent independently,
+# "sus" uses stochastic universal sampling, which spreads the draws more evenly.
+SELECTION = "roulette"
+
+# Fraction of each new generation's children discarded by the surrogate fitness of analytics.py
+# before they play any games. Extra children are bred to make up the difference. Zero disables.
+CULL_FRACTION = 0
+
+# Games played against each reference strategy of baselines.py when a champion is evaluated.
+BASELINE_GAMES = 10000
+
+# Number of rounds between evaluations of the fittest organism against the reference strategies,
+# when evolution is given a baselines file.
+BASELINE_INTERVAL = 10
+
+# A game is recorded once in this many games when evolution is given a trace file, so that
+# recording barely slows evolution.
+TRACE_SAMPLE_EVERY = 100
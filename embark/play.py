@@ -18,8 +18,7 @@ class Human(Player):
         """Display player statistics and prompt for a card."""
         self.display_hand()
         self.display_balance()
-        below_balance = {card for card in available
-                         if card(self, self.game).cost <= self.balance}
+        below_balance = {card for card in available if card.cost <= self.balance}
         return prompt(below_balance,
                       "Which card would you like to buy?",
                       lambda card: card.__name__)
@@ -44,6 +43,18 @@ class Human(Player):
                       "Which card is your least favorite?",
                       lambda card: card.__class__.__name__)
 
+    def choose_opponent(self, opponents):
+        """Ask which opponent pays, unless there is only one. Someone must pay, so there is
+        no option to skip.
+        """
+        if len(opponents) == 1:
+            return opponents[0]
+        return prompt(opponents,
+                      "Which opponent should pay you?",
+                      lambda opponent: f"Seat {self.game.players.index(opponent) + 1} "
+                                       f"({opponent.balance} coins)",
+                      optional=False)
+
 
 def human_vs_computer(organism):
     game = Game(organism, Human())
@@ -54,8 +65,10 @@ def human_vs_computer(organism):
         print("You won!")
 
 
-def prompt(items, message, key=None):
-    """Ask the user to select an item from a list."""
+def prompt(items, message, key=None, optional=True):
+    """Ask the user to select an item from a list. When optional, the user may also choose
+    None, and None is returned.
+    """
     if not key:
         key = lambda x: x
 
@@ -63,7 +76,7 @@ def prompt(items, message, key=None):
     questions = [
         inquirer.List("choice",
                       message=message,
-                      choices=list(key_to_item.keys()) + [None])
+                      choices=list(key_to_item.keys()) + ([None] if optional else []))
     ]
     choice = inquirer.prompt(questions)["choice"]
     if choice:
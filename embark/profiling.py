@@ -0,0 +1,72 @@
+"""
+profiling.py
+
+@author Elliot Penson
+"""
+
+from collections import Counter
+from time import perf_counter
+
+PHASES = ["roll", "earn", "construct", "purchase", "trade"]
+
+
+class Profiler:
+
+    def __init__(self):
+        """Collect the time spent in each phase of Game.simulate_round. A game only reports to a
+        profiler when given one, so unprofiled games pay nothing.
+        """
+        self.generations = []
+        self.reset()
+
+    def reset(self):
+        self.times = Counter()
+        self.calls = Counter()
+        self.games = 0
+        self.turns = 0
+
+    def time(self, phase, function, *arguments):
+        """Call a function and charge its duration to a phase."""
+        start = perf_counter()
+        value = function(*arguments)
+        self.times[phase] += perf_counter() - start
+        self.calls[phase] += 1
+        return value
+
+    def end_game(self, game):
+        self.games += 1
+        self.turns += game.turns
+
+    def get_statistics(self):
+        """Return the counts collected since the last reset as a plain (picklable) dict."""
+        return {"times": dict(self.times), "calls": dict(self.calls), "games": self.games,
+                "turns": self.turns}
+
+    def merge(self, statistics):
+        """Add statistics from get_statistics, e.g. from a profiler in a worker process."""
+        self.times.update(statistics["times"])
+        self.calls.update(statistics["calls"])
+        self.games += statistics["games"]
+        self.turns += statistics["turns"]
+
+    def end_generation(self):
+        self.generations.append(self.get_statistics())
+        self.reset()
+
+    def summary(self):
+        """Return a table of the time spent in each phase over every finished generation."""
+        total = Profiler()
+        for statistics in self.generations:
+            total.merge(statistics)
+        total_time = sum(total.times.values()) - total.times["trade"]  # Trades are in earn.
+        lines = [f"{'Phase':<10} {'Seconds':>10} {'Share':>7} {'Calls':>12} {'us/call':>9}"]
+        for phase in PHASES:
+            seconds, calls = total.times[phase], total.calls[phase]
+            share = seconds / total_time if total_time else 0
+            per_call = 1e6 * seconds / calls if calls else 0
+            lines.append(f"{phase:<10} {seconds:>10.3f} {share:>7.1%} {calls:>12} {per_call:>9.2f}")
+        games = max(total.games, 1)
+        lines.append(f"{len(self.generations)} generations, {total.games} games, "
+                     f"{total.turns / games:.1f} turns per game, "
+                     f"{total.calls['trade'] / games:.2f} trades per game")
+        return "\n".join(lines)
@@ -0,0 +1,48 @@
+"""
+rating.py
+
+@author Elliot Penson
+"""
+
+INITIAL_RATING = 1500
+
+# The most rating points that can change hands in a single game.
+K_FACTOR = 32
+
+# Standard normal quantile of confidence intervals on win rates (1.96 gives 95% intervals).
+WILSON_Z = 1.96
+
+
+def expected_score(rating, opponent_rating):
+    """The Elo estimate of the probability that a player beats their opponent."""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def update_ratings(player, opponent, score, k_factor=K_FACTOR):
+    """Move rating points between two players after a game. The score is 1 if the player won,
+    0 if they lost, or a fraction when averaging several games. Both players must have a rating
+    attribute.
+    """
+    change = k_factor * (score - expected_score(player.rating, opponent.rating))
+    player.rating += change
+    opponent.rating -= change
+
+
+def strength(rating):
+    """Convert a rating into a positive weight. The ratio of two strengths is the odds that one
+    player beats the other, which makes strength suitable for fitness-proportionate selection.
+    """
+    return 10 ** ((rating - INITIAL_RATING) / 400)
+
+
+def wilson_interval(wins, games, z=WILSON_Z):
+    """Return a (low, high) confidence interval for a win rate, using the Wilson score interval.
+    Unlike the normal approximation, it behaves well for a few games or extreme win rates.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    rate = wins / games
+    center = (rate + z ** 2 / (2 * games)) / (1 + z ** 2 / games)
+    margin = (z / (1 + z ** 2 / games)
+              * (rate * (1 - rate) / games + z ** 2 / (4 * games ** 2)) ** 0.5)
+    return center - margin, center + margin
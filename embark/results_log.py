@@ -0,0 +1,105 @@
+"""
+results_log.py
+
+@author Elliot Penson
+"""
+
+import csv
+import os
+import tempfile
+from statistics import mean, pvariance
+
+from embark.machi_koro import ALL_CARDS
+from embark.parameters import RESULTS_FLUSH_INTERVAL
+
+
+class ResultsLog:
+
+    def __init__(self, path, flush_interval=RESULTS_FLUSH_INTERVAL):
+        """Append the organisms of every generation to a CSV file (in the format of
+        evolution.export, with a leading Generation column) and a summary of each generation to
+        a second CSV file next to it. Rows are buffered and written every flush_interval
+        generations, so memory use doesn't grow with the length of a run.
+        """
+        self.path = path
+        self.generations_path = os.path.splitext(path)[0] + "-generations.csv"
+        self.flush_interval = flush_interval
+        self.organism_rows = []
+        self.generation_rows = []
+        self.buffered_generations = 0
+
+    def write(self, generation_index, generation):
+        """Record a generation whose fitness has been set."""
+        genes = [[organism[card] for card in ALL_CARDS] for organism in generation]
+        for organism, organism_genes in zip(generation, genes):
+            self.organism_rows.append([generation_index, organism.wins] + organism_genes)
+        fitnesses = [organism.fitness for organism in generation]
+        gene_variance = mean(pvariance(column) for column in zip(*genes))
+        self.generation_rows.append([generation_index, mean(fitnesses), max(fitnesses),
+                                     gene_variance])
+        self.buffered_generations += 1
+        if self.buffered_generations >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        append_rows(self.path, ["Generation", "Wins"] + [card.__name__ for card in ALL_CARDS],
+                    self.organism_rows)
+        append_rows(self.generations_path,
+                    ["Generation", "MeanFitness", "MaxFitness", "GeneVariance"],
+                    self.generation_rows)
+        self.organism_rows, self.generation_rows = [], []
+        self.buffered_generations = 0
+
+    def truncate(self, generations):
+        """Drop the rows of generations from this index on, from the buffer and from both files,
+        such as when a run is resumed from an earlier checkpoint. Dropping every generation
+        empties the files without reading them.
+        """
+        self.organism_rows = [row for row in self.organism_rows if row[0] < generations]
+        self.generation_rows = [row for row in self.generation_rows if row[0] < generations]
+        self.buffered_generations = len(self.generation_rows)
+        for file_name in [self.path, self.generations_path]:
+            if not os.path.exists(file_name):
+                continue
+            if generations <= 0:
+                open(file_name, "w").close()  # append_rows starts empty files with a heading.
+            else:
+                keep_rows(file_name, lambda row: int(row[0]) < generations)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.flush()
+
+
+def append_rows(file_name, heading, rows):
+    """Add rows to a CSV file, starting it with a heading if it's new."""
+    is_new = not os.path.exists(file_name) or os.path.getsize(file_name) == 0
+    with open(file_name, "a", newline="") as csvfile:
+        report = csv.writer(csvfile)
+        if is_new:
+            report.writerow(heading)
+        report.writerows(rows)
+
+
+def keep_rows(file_name, predicate):
+    """Rewrite a CSV file with its heading and the rows that satisfy a predicate. Rows are
+    streamed through a temporary file, which replaces the old file in one step.
+    """
+    directory = os.path.dirname(os.path.abspath(file_name))
+    with open(file_name, newline="") as csvfile, \
+            tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", newline="",
+                                        delete=False) as temporary:
+        try:
+            rows = csv.reader(csvfile)
+            report = csv.writer(temporary)
+            heading = next(rows, None)
+            if heading:
+                report.writerow(heading)
+            report.writerows(row for row in rows if predicate(row))
+        except BaseException:
+            temporary.close()
+            os.remove(temporary.name)
+            raise
+    os.replace(temporary.name, file_name)
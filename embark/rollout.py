@@ -0,0 +1,145 @@
+"""
+rollout.py
+
+A player that decides what to buy by playing out the rest of the game many times.
+
+@author Elliot Penson
+"""
+
+from time import monotonic
+
+import numpy
+
+from embark.dice import Dice
+from embark.machi_koro import Game, Player, ALL_CARDS, CARD_INDEX
+from embark.strategies import RandomPlayer
+
+# Playouts per decision, shared between the candidate purchases.
+PLAYOUTS = 64
+
+# Seconds a decision may take. Playouts that haven't started by then are skipped.
+TIME_BUDGET = 0.1
+
+# Turns after which an unfinished playout counts as a loss.
+MAX_TURNS = 400
+
+
+class RolloutPlayer(Player):
+
+    def __init__(self, playouts=PLAYOUTS, time_budget=TIME_BUDGET, workers=1, seed=None):
+        """Choose each purchase by snapshotting the game, then trying every affordable card (and
+        buying nothing) in playouts where everyone buys at random. The candidate that wins the
+        most playouts is bought.
+
+        :param workers: Number of processes that run playouts. Call close when done with them.
+        :param seed: Seed for the playouts
+        """
+        super().__init__()
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.workers = workers
+        self.seed_sequence = numpy.random.SeedSequence(seed)
+        self.simulators = {}  # number of players -> Playouts
+        self.pool = None
+
+    def construct_from_mask(self, mask):
+        candidates = [card for card in ALL_CARDS
+                      if mask >> CARD_INDEX[card] & 1 and card.cost <= self.balance]
+        if not candidates:
+            return None
+        candidates.append(None)  # Last, so that ties go to buying something.
+        snapshot = self.game.snapshot()
+        seat = self.game.players.index(self)
+        if self.workers > 1:
+            wins, played = self.run_in_pool(snapshot, seat, candidates)
+        else:
+            if len(self.game.players) not in self.simulators:
+                self.simulators[len(self.game.players)] = Playouts(
+                    len(self.game.players), self.seed_sequence.spawn(1)[0])
+            simulator = self.simulators[len(self.game.players)]
+            wins, played = simulator.run(snapshot, seat, candidates, self.playouts,
+                                         monotonic() + self.time_budget)
+        win_rates = [win / games if games else 0 for win, games in zip(wins, played)]
+        return candidates[win_rates.index(max(win_rates))]
+
+    def run_in_pool(self, snapshot, seat, candidates):
+        """Split the playouts between worker processes and add up their results."""
+        if self.pool is None:
+            # Imported here, since starting up multiprocessing is slow and often not needed.
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(self.workers)
+        shares = [self.playouts // self.workers + (worker < self.playouts % self.workers)
+                  for worker in range(self.workers)]
+        seeds = self.seed_sequence.spawn(self.workers)
+        results = list(self.pool.map(run_playouts, [snapshot] * self.workers,
+                                     [seat] * self.workers, [candidates] * self.workers,
+                                     shares, [self.time_budget] * self.workers, seeds))
+        wins = [sum(counts) for counts in zip(*[worker_wins for worker_wins, _ in results])]
+        played = [sum(counts) for counts in zip(*[worker_played for _, worker_played in results])]
+        return wins, played
+
+    def choose_favorite_card(self, cards):
+        """Take the most expensive card, which is usually the hardest to get."""
+        return max(cards, key=lambda card: (card.cost, CARD_INDEX[card.__class__]), default=None)
+
+    def choose_least_favorite_card(self, cards):
+        return min(cards, key=lambda card: (card.cost, CARD_INDEX[card.__class__]), default=None)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+class Playouts:
+
+    def __init__(self, n_players, seed):
+        """A game between RandomPlayers that positions are restored into before each playout.
+
+        :param seed: A numpy.random.SeedSequence for the dice and the players
+        """
+        dice_seed, *player_seeds = seed.spawn(n_players + 1)
+        players = [RandomPlayer(int(player_seed.generate_state(1)[0]))
+                   for player_seed in player_seeds]
+        self.game = Game(players[0], players[1], Dice(dice_seed), others=players[2:])
+
+    def run(self, snapshot, seat, candidates, playouts, deadline):
+        """Play the candidates in turn until the playouts are used up or the deadline (a
+        time.monotonic value) passes. Return the wins and playouts of each candidate.
+        """
+        wins, played = [0] * len(candidates), [0] * len(candidates)
+        for playout in range(playouts):
+            if monotonic() > deadline:
+                break
+            index = playout % len(candidates)
+            wins[index] += self.play(snapshot, seat, candidates[index])
+            played[index] += 1
+        return wins, played
+
+    def play(self, snapshot, seat, candidate):
+        """Restore the snapshot, buy the candidate for the player in a seat, and finish the
+        game. Return whether that player won.
+        """
+        game = self.game
+        game.restore(snapshot)
+        player = game.players[seat]
+        if candidate:
+            game.purchase_card(candidate, player)
+        game.end_turn(False)
+        last_turn = game.turns + MAX_TURNS
+        while not game.winner and game.turns < last_turn:
+            game.simulate_round()
+        return game.winner is player
+
+
+# Playouts kept by each worker process between decisions, by number of players.
+worker_simulators = {}
+
+
+def run_playouts(snapshot, seat, candidates, playouts, time_budget, seed):
+    """Run Playouts.run in a worker process. The simulator is made once per process."""
+    deadline = monotonic() + time_budget
+    n_players = len(snapshot[-1])
+    if n_players not in worker_simulators:
+        worker_simulators[n_players] = Playouts(n_players, seed)
+    return worker_simulators[n_players].run(snapshot, seat, candidates, playouts, deadline)
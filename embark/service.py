@@ -0,0 +1,265 @@
+"""
+service.py
+
+Serve the decisions of evolved organisms to many concurrent games. Start a server with the
+organisms in a report written by evolution.export, then measure it with the load test:
+
+    python -m embark.service serve report.csv --port 8765
+    python -m embark.service load-test --port 8765 --clients 50
+
+Requests and responses are JSON objects, one per line. A request names an organism from the
+report ("best" or a row number), a method and the names of the cards to choose from:
+
+    {"id": 1, "organism": "best", "method": "construct", "cards": ["WheatField", "Cafe"]}
+    {"id": 1, "card": "Cafe"}
+
+@author Elliot Penson
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+import asyncio
+import json
+
+import numpy
+
+from embark.batch import sample_cards
+from embark.evolution import load_organisms
+from embark.machi_koro import ALL_CARDS, CARD_INDEX
+
+CARDS_BY_NAME = {card.__name__: card for card in ALL_CARDS}
+METHODS = ["construct", "choose_favorite_card", "choose_least_favorite_card"]
+DEFAULT_PORT = 8765
+
+# Most requests answered by one vectorized call.
+BATCH_SIZE = 256
+
+# Seconds the service waits for more requests to join a batch after the first arrives.
+BATCH_WINDOW = 0.001
+
+
+class DecisionService:
+
+    def __init__(self, organisms, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW, rng=None):
+        """Answer the purchase and trading decisions of organisms. Concurrent requests are
+        collected into batches, and each batch is decided with one call per method. Call start
+        from a running event loop before asking for decisions.
+
+        :param organisms: Dict of organism name -> genes in ALL_CARDS order
+        :param rng: A numpy.random.Generator for construct
+        """
+        self.names = {name: index for index, name in enumerate(organisms)}
+        self.genes = numpy.array(list(organisms.values()), dtype=float)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+        # Made by start, since before Python 3.10 a queue belongs to the loop it was made in.
+        self.queue = None
+        self.batcher = None
+        self.batches = 0
+
+    def start(self):
+        """Begin deciding queued requests in a task on the running event loop."""
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self.process_batches())
+        self.batcher.add_done_callback(self.fail_queued)
+
+    def stop(self):
+        if self.batcher:
+            self.batcher.cancel()
+
+    async def decide(self, organism, method, card_names):
+        """Return the name of the card an organism picks from a list of card names, or None if
+        the list is empty.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}.")
+        if not self.batcher or self.batcher.done():
+            raise RuntimeError("The decision service isn't running.")
+        available = numpy.zeros(len(ALL_CARDS), dtype=bool)
+        available[[CARD_INDEX[CARDS_BY_NAME[name]] for name in card_names]] = True
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((self.names[organism], method, available, future))
+        return await future
+
+    async def process_batches(self):
+        """Decide queued requests until cancelled. If deciding fails, the requests of the batch
+        fail with the same error.
+        """
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                if self.batch_window:
+                    await asyncio.sleep(self.batch_window)
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                self.resolve(batch)
+            except BaseException as error:
+                fail([request[3] for request in batch], error)
+                raise
+
+    def fail_queued(self, batcher):
+        """Fail the requests still queued once the batcher has stopped, so none wait forever."""
+        error = RuntimeError("The decision service stopped.")
+        if not batcher.cancelled() and batcher.exception():
+            error.__cause__ = batcher.exception()
+        futures = []
+        while not self.queue.empty():
+            futures.append(self.queue.get_nowait()[3])
+        fail(futures, error)
+
+    def resolve(self, batch):
+        self.batches += 1
+        for method in METHODS:
+            requests = [request for request in batch if request[1] == method]
+            if not requests:
+                continue
+            organisms, _, available, futures = zip(*requests)
+            genes, available = self.genes[list(organisms)], numpy.array(available)
+            if method == "construct":
+                choices = sample_cards(genes, available, self.rng)
+            elif method == "choose_favorite_card":
+                choices = numpy.where(available, genes, -numpy.inf).argmax(axis=1)
+            else:
+                choices = numpy.where(available, genes, numpy.inf).argmin(axis=1)
+            for future, choice, has_cards in zip(futures, choices, available.any(axis=1)):
+                if not future.done():
+                    future.set_result(ALL_CARDS[choice].__name__ if has_cards else None)
+
+    async def handle(self, reader, writer):
+        """Answer the requests of one connection. Requests on a connection may be pipelined,
+        and their responses can arrive out of order. A request that can't be answered gets an
+        error response, and the connection carries on.
+        """
+        async def answer(line):
+            request = None
+            try:
+                request = json.loads(line)
+                response = {"card": await self.decide(request["organism"], request["method"],
+                                                      request["cards"])}
+            except (KeyError, ValueError, TypeError, AttributeError, RuntimeError) as error:
+                response = {"error": str(error)}
+            response["id"] = request.get("id") if isinstance(request, dict) else None
+            writer.write(json.dumps(response).encode() + b"\n")
+
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+def fail(futures, error):
+    for future in futures:
+        if not future.done():
+            future.set_exception(error)
+
+
+def run(coroutine):
+    """Run a coroutine in a new event loop, like asyncio.run (which needs Python 3.7). Tasks
+    left running at the end are cancelled and allowed to clean up.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        # asyncio.all_tasks is new in Python 3.7, and Task.all_tasks is gone from 3.9.
+        all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+        tasks = [task for task in all_tasks(loop) if not task.done()]
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+async def serve(organisms, host="127.0.0.1", port=DEFAULT_PORT, path=None, started=None):
+    """Run a DecisionService on localhost TCP, or on a Unix socket when a path is given.
+
+    :param started: An asyncio.Event set once the server accepts connections
+    """
+    service = DecisionService(organisms)
+    service.start()
+    if path:
+        server = await asyncio.start_unix_server(service.handle, path)
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+    if started:
+        started.set()
+    try:
+        # Wait until cancelled. (Server.serve_forever needs Python 3.7.)
+        await asyncio.get_event_loop().create_future()
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.stop()
+
+
+async def load_test(host="127.0.0.1", port=DEFAULT_PORT, path=None, clients=10, requests=100,
+                    organism="best", seed=None):
+    """Open a number of connections that each send requests for random decisions one after the
+    other. Return the p50 and p99 latency in seconds and the requests answered per second.
+    """
+    rng = numpy.random.default_rng(seed)
+
+    async def client():
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        latencies = []
+        for request_id in range(requests):
+            cards = [card.__name__ for card in ALL_CARDS if rng.random() < 0.5]
+            request = {"id": request_id, "organism": organism,
+                       "method": METHODS[request_id % len(METHODS)], "cards": cards}
+            start = perf_counter()
+            writer.write(json.dumps(request).encode() + b"\n")
+            response = json.loads(await reader.readline())
+            latencies.append(perf_counter() - start)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+        writer.close()
+        return latencies
+
+    start = perf_counter()
+    results = await asyncio.gather(*[client() for _ in range(clients)])
+    seconds = perf_counter() - start
+    latencies = numpy.concatenate(results)
+    return {"p50": numpy.percentile(latencies, 50), "p99": numpy.percentile(latencies, 99),
+            "requests/s": len(latencies) / seconds}
+
+
+def main():
+    parser = ArgumentParser(prog="python -m embark.service",
+                            description="Serve the decisions of evolved organisms.")
+    parser.add_argument("command", choices=["serve", "load-test"])
+    parser.add_argument("report", nargs="?", default="report.csv",
+                        help="organisms written by evolution.export (serve only)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", metavar="PATH", help="use a Unix socket instead of TCP")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent load test clients")
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    arguments = parser.parse_args()
+
+    if arguments.command == "serve":
+        run(serve(load_organisms(arguments.report), arguments.host, arguments.port,
+                  arguments.socket))
+    else:
+        results = run(load_test(arguments.host, arguments.port, arguments.socket,
+                                arguments.clients, arguments.requests))
+        print(f"p50 latency {results['p50'] * 1000:.3f} ms")
+        print(f"p99 latency {results['p99'] * 1000:.3f} ms")
+        print(f"throughput  {results['requests/s']:.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
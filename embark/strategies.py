@@ -0,0 +1,93 @@
+"""
+strategies.py
+
+Simple players that don't evolve, used as baselines and inside rollouts.
+
+@author Elliot Penson
+"""
+
+from random import Random
+
+from embark.machi_koro import Player, ALL_CARDS, CARD_INDEX, LANDMARKS
+
+
+class RandomPlayer(Player):
+
+    def __init__(self, seed=None):
+        """A player that buys a random affordable card every turn. It draws from its own
+        random.Random, so it doesn't disturb the random module.
+        """
+        super().__init__()
+        self.random = Random(seed)
+
+    def construct(self, available):
+        affordable = [card for card in ALL_CARDS if card in available and card.cost <= self.balance]
+        return self.random.choice(affordable) if affordable else None
+
+    def construct_from_mask(self, mask):
+        affordable = [card for card in ALL_CARDS
+                      if mask >> CARD_INDEX[card] & 1 and card.cost <= self.balance]
+        return self.random.choice(affordable) if affordable else None
+
+    def choose_favorite_card(self, cards):
+        return self.choose_any_card(cards)
+
+    def choose_least_favorite_card(self, cards):
+        return self.choose_any_card(cards)
+
+    def choose_opponent(self, opponents):
+        return self.random.choice(opponents)
+
+    def choose_any_card(self, cards):
+        """Pick a random kind of card, in an order that doesn't depend on object ids."""
+        kinds = sorted({card.__class__ for card in cards}, key=CARD_INDEX.get)
+        if not kinds:
+            return None
+        kind = self.random.choice(kinds)
+        return next(card for card in cards if card.__class__ is kind)
+
+
+class GreedyPlayer(Player):
+
+    # Card classes in order of preference. Subclasses fill this in.
+    preference = ()
+
+    def __init__(self, seed=None):
+        """A player that buys the first affordable card in its order of preference, and values
+        cards by their cost when trading. The seed is ignored, since greedy players never draw
+        random numbers, but it lets every baseline be made the same way.
+        """
+        super().__init__()
+
+    def construct(self, available):
+        return next((card for card in self.preference
+                     if card in available and card.cost <= self.balance), None)
+
+    def construct_from_mask(self, mask):
+        return next((card for card in self.preference
+                     if mask >> CARD_INDEX[card] & 1 and card.cost <= self.balance), None)
+
+    def choose_favorite_card(self, cards):
+        return max(cards, key=self.card_value, default=None)
+
+    def choose_least_favorite_card(self, cards):
+        return min(cards, key=self.card_value, default=None)
+
+    @staticmethod
+    def card_value(card):
+        return card.cost, CARD_INDEX[card.__class__]
+
+
+class CheapestPlayer(GreedyPlayer):
+    """Buy the cheapest affordable card every turn."""
+    preference = sorted(ALL_CARDS, key=lambda card: card.cost)
+
+
+class ExpensivePlayer(GreedyPlayer):
+    """Buy the most expensive affordable card every turn."""
+    preference = sorted(ALL_CARDS, key=lambda card: -card.cost)
+
+
+class LandmarkRushPlayer(GreedyPlayer):
+    """Buy nothing but landmarks, cheapest first, saving up for each one."""
+    preference = sorted(LANDMARKS, key=lambda card: card.cost)
@@ -0,0 +1,242 @@
+"""
+trace.py
+
+Record what happens in a sample of games as compact binary events, and replay recorded games
+through Game to check that they play out the same way:
+
+    recorder = Recorder("games.trace", sample_every=100)
+    game = Game(player1, player2, recorder=recorder)
+    ...
+    recorder.close()
+    for game in replay(read_games("games.trace")[0]):
+        print(game.turns, [player.balance for player in game.players])
+
+Every event is one fixed-width record of (kind, seat, a, b, value). The meaning of a, b and
+value depends on the kind of event, as described next to each kind below.
+
+@author Elliot Penson
+"""
+
+from collections import deque
+import struct
+
+import numpy
+
+from embark.machi_koro import ALL_CARDS, CARD_INDEX, Game, Player
+from embark.parameters import TRACE_SAMPLE_EVERY
+
+# Layout of one event: kind, seat, a, b, value.
+EVENT = struct.Struct("<BBbbi")
+EVENT_DTYPE = numpy.dtype([("kind", "u1"), ("seat", "u1"), ("a", "i1"), ("b", "i1"),
+                           ("value", "<i4")])
+
+GAME_START = 0  # seat: number of players, value: number of the game among those recorded
+ROLL = 1  # a: first die, b: second die or 0
+BALANCE = 2  # value: the seat's balance after earning, one event per seat
+TARGET = 3  # a: the seat a TV Station takes coins from
+TRADE = 4  # a: card given, b: card received, value: seat traded with
+PURCHASE = 5  # a: card chosen or -1, value: balance afterwards
+EXTRA_TURN = 6  # The seat rolled doubles and plays again.
+GAME_END = 7  # seat: winner, value: turns
+
+# Events held in a game's buffer before they are written to the file.
+BUFFER_EVENTS = 512
+
+
+class Recorder:
+
+    def __init__(self, path, sample_every=TRACE_SAMPLE_EVERY, buffer_events=BUFFER_EVENTS):
+        """Write the events of one game in every sample_every games to a binary file. A Game
+        given a recorder asks it whether to trace each game it simulates. Games that aren't
+        traced run exactly as they would without a recorder.
+        """
+        self.file = open(path, "wb")
+        self.sample_every = sample_every
+        self.buffer = bytearray(buffer_events * EVENT.size)
+        self.games = 0
+        self.recorded = 0
+
+    def start_game(self, game):
+        """Return a GameTrace for the game if it is sampled, otherwise None."""
+        self.games += 1
+        if (self.games - 1) % self.sample_every:
+            return None
+        self.recorded += 1
+        return GameTrace(self, game, self.recorded - 1)
+
+    def write(self, events):
+        self.file.write(events)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+class TracedDice:
+
+    def __init__(self, dice):
+        """Pass rolls through from other dice, remembering the faces of the current turn."""
+        self.dice = dice
+        self.faces = []
+
+    def roll(self):
+        face = self.dice.roll()
+        self.faces.append(face)
+        return face
+
+
+class GameTrace:
+
+    def __init__(self, recorder, game, number):
+        """Record the events of one game into the recorder's ring buffer. The buffer is written
+        to the file whenever it fills up and when the game ends.
+        """
+        self.recorder = recorder
+        self.game = game
+        self.buffer = recorder.buffer
+        self.offset = 0
+        self.dice = game.dice = TracedDice(game.dice)
+        self.event(GAME_START, len(game.players), 0, 0, number)
+
+    def event(self, kind, seat, a=0, b=0, value=0):
+        EVENT.pack_into(self.buffer, self.offset, kind, seat, a, b, value)
+        self.offset += EVENT.size
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.recorder.write(memoryview(self.buffer)[:self.offset])
+        self.offset = 0
+
+    def seat(self, player):
+        return self.game.players.index(player)
+
+    def roll(self, seat):
+        faces = self.dice.faces
+        self.event(ROLL, seat, faces[0], faces[1] if len(faces) > 1 else 0)
+        faces.clear()
+
+    def balances(self):
+        for seat, player in enumerate(self.game.players):
+            self.event(BALANCE, seat, value=player.balance)
+
+    def target(self, player, opponent):
+        self.event(TARGET, self.seat(player), self.seat(opponent))
+
+    def trade(self, player, card_to_give, card_to_get):
+        self.event(TRADE, self.seat(player), CARD_INDEX[type(card_to_give)],
+                   CARD_INDEX[type(card_to_get)], self.seat(card_to_get.owner))
+
+    def purchase(self, seat, card_class, balance):
+        self.event(PURCHASE, seat, CARD_INDEX[card_class] if card_class else -1, value=balance)
+
+    def extra_turn(self, seat):
+        self.event(EXTRA_TURN, seat)
+
+    def end_game(self):
+        """Write the rest of the game's events and give the game back its own dice. A game
+        that stopped without a winner, such as when a round raised, gets no GAME_END event.
+        """
+        if self.game.winner:
+            self.event(GAME_END, self.seat(self.game.winner), value=self.game.turns)
+        self.flush()
+        self.game.dice = self.dice.dice
+
+
+def read_games(path):
+    """Read a trace file into a list of arrays of events (see EVENT_DTYPE), one per game."""
+    events = numpy.fromfile(path, dtype=EVENT_DTYPE)
+    starts = numpy.flatnonzero(events["kind"] == GAME_START)
+    return numpy.split(events, starts[1:])
+
+
+class ReplayDice:
+
+    def __init__(self, faces):
+        self.faces = deque(faces)
+
+    def roll(self):
+        return self.faces.popleft()
+
+
+class ScriptedPlayer(Player):
+
+    def __init__(self):
+        """A player that makes the decisions recorded in a trace, in the order recorded."""
+        super().__init__()
+        self.purchases = deque()
+        self.trades = deque()
+        self.targets = deque()
+
+    def construct_from_mask(self, mask):
+        index = self.purchases.popleft()
+        return ALL_CARDS[index] if index >= 0 else None
+
+    def choose_least_favorite_card(self, cards):
+        card_to_give = ALL_CARDS[self.trades[0][0]]
+        return next((card for card in cards if type(card) is card_to_give), None)
+
+    def choose_favorite_card(self, cards):
+        _, card_to_get, seat = self.trades.popleft()
+        owner = self.game.players[seat]
+        return next((card for card in cards
+                     if type(card) is ALL_CARDS[card_to_get] and card.owner is owner), None)
+
+    def choose_opponent(self, opponents):
+        return self.game.players[self.targets.popleft()]
+
+
+def replay(events):
+    """Play a recorded game again through Game. Yield the game after each turn. Raise a
+    RuntimeError at the first turn that doesn't match the recording.
+
+    :param events: The events of one game, as returned by read_games
+    """
+    players = [ScriptedPlayer() for _ in range(events[0]["seat"])]
+    faces = []
+    for kind, seat, a, b, value in events.tolist():
+        if kind == ROLL:
+            faces.extend(face for face in (a, b) if face)
+        elif kind == PURCHASE:
+            players[seat].purchases.append(a)
+        elif kind == TRADE:
+            players[seat].trades.append((a, b, value))
+        elif kind == TARGET:
+            players[seat].targets.append(a)
+    game = Game(players[0], players[1], ReplayDice(faces), others=players[2:])
+
+    def check(turn, description, expected, actual):
+        if expected != actual:
+            raise RuntimeError(f"Turn {turn}: expected {description} {expected}, "
+                               f"but the replay gave {actual}.")
+
+    balances = []
+    for kind, seat, a, b, value in events.tolist():
+        player = game.active_player
+        if kind == ROLL:
+            check(game.turns + 1, "the turn of seat", seat, game.active)
+            game.turns += 1
+            roll_number, was_double = player.roll()
+            game.earn(roll_number)
+        elif kind == BALANCE:
+            balances.append(value)
+        elif kind == PURCHASE:
+            check(game.turns, "balances", balances,
+                  [other.balance for other in game.players])
+            balances = []
+            card_class = player.construct_from_mask(game.available_mask(player))
+            if card_class:
+                game.purchase_card(card_class, player)
+            check(game.turns, "a balance of", value, player.balance)
+            game.end_turn(was_double)
+            yield game
+        elif kind == EXTRA_TURN:
+            check(game.turns, "an extra turn for seat", seat, game.active)
+        elif kind == GAME_END:
+            check(game.turns, "a winner in seat", seat,
+                  game.players.index(game.winner) if game.winner else None)
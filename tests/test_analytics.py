@@ -0,0 +1,49 @@
+"""
+test_analytics.py
+
+@author Elliot Penson
+"""
+
+import numpy
+from pytest import approx
+
+from embark.analytics import (ONE_DIE, TWO_DICE, expected_income, income_by_roll,
+                              surrogate_fitness, cull)
+from embark.machi_koro import ALL_CARDS, CARD_INDEX, STARTING_HAND
+from embark.cards import WheatField, Bakery, TrainStation, ShoppingMall, Cafe
+
+
+def hand_of(*cards):
+    hand = numpy.zeros(len(ALL_CARDS))
+    for card in cards:
+        hand[CARD_INDEX[card]] += 1
+    return hand
+
+
+def test_roll_probabilities():
+    assert ONE_DIE.sum() == approx(1) and TWO_DICE.sum() == approx(1)
+    assert ONE_DIE[1] == approx(1 / 6) and ONE_DIE[7] == 0
+    assert TWO_DICE[7] == approx(6 / 36) and TWO_DICE[1] == 0
+
+
+def test_expected_income_of_starting_hand():
+    # Wheat Field pays on a 1 on any turn, Bakery on a 2 or 3 on the owner's turn.
+    assert expected_income(STARTING_HAND, own_turn=True) == approx([3 / 6])
+    assert expected_income(STARTING_HAND, own_turn=False) == approx([1 / 6])
+
+
+def test_expected_income_follows_the_dice():
+    # A Train Station rolls two dice, so the Wheat Field can no longer pay.
+    assert expected_income(hand_of(WheatField, TrainStation)) == approx([0])
+    # Shopping Mall adds one coin to each Bakery payout.
+    assert expected_income(hand_of(Bakery, ShoppingMall)) == approx([2 * 2 / 6])
+    # Cafe takes from the player who rolled a 3.
+    assert income_by_roll(hand_of(Cafe), own_turn=False)[0, 3] == 1
+
+
+def test_surrogate_fitness_culls_strategies_without_landmarks():
+    population = numpy.full((3, len(ALL_CARDS)), 1 / len(ALL_CARDS))
+    population[1] = hand_of(WheatField)  # Never buys a landmark.
+    scores = surrogate_fitness(population)
+    assert scores[1] == 0 and scores[0] > 0
+    assert list(cull(population, 2)) == [0, 2]
@@ -0,0 +1,62 @@
+"""
+test_archive.py
+
+@author Elliot Penson
+"""
+
+import numpy
+from pytest import approx
+
+from embark.archive import ArchiveWriter, open_archive, card_history
+from embark.cards import TrainStation
+from embark.engine import FastGame
+from embark.evolution import Organism, make_random_chromosome, run
+from embark.machi_koro import ALL_CARDS
+
+
+def make_generation(size):
+    generation = [Organism(make_random_chromosome()) for _ in range(size)]
+    for wins, organism in enumerate(generation):
+        organism.wins = organism.fitness = wins
+    return generation
+
+
+def test_append_and_reopen(tmp_path):
+    path = str(tmp_path / "run")
+    generations = [make_generation(3) for _ in range(5)]
+    with ArchiveWriter(path, flush_interval=2) as writer:
+        for index, generation in enumerate(generations[:3]):
+            writer.write(index, generation)
+    # Continue the archive in a second writer, as a resumed run would.
+    with ArchiveWriter(path) as writer:
+        for index, generation in enumerate(generations[3:], start=3):
+            writer.write(index, generation)
+
+    archive = open_archive(path)
+    assert archive.cards == [card.__name__ for card in ALL_CARDS]
+    assert archive.genes.shape == (5, 3, len(ALL_CARDS))
+    assert isinstance(archive.genes, numpy.memmap)
+    assert (archive.genes[4] == [organism.genes for organism in generations[4]]).all()
+    assert (archive.wins == [0, 1, 2]).all()
+    assert (card_history(archive, "TrainStation")[:, 1] ==
+            [generation[1][TrainStation] for generation in generations]).all()
+    assert (numpy.load(tmp_path / "run" / "fitness.npy") == archive.fitness).all()
+
+    writer = ArchiveWriter(path)
+    writer.truncate(2)
+    assert open_archive(path).genes.shape == (2, 3, len(ALL_CARDS))
+
+
+def test_run_archives_every_generation(tmp_path):
+    path = str(tmp_path / "run")
+    run(rounds=3, size=4, seed=0, engine=FastGame, archive_path=path)
+    archive = open_archive(path)
+    assert archive.genes.shape == (3, 4, len(ALL_CARDS))
+    assert archive.genes.sum(axis=2) == approx(numpy.ones((3, 4)))
+
+
+def test_new_run_replaces_archive_of_another_size(tmp_path):
+    path = str(tmp_path / "run")
+    run(rounds=2, size=4, seed=0, engine=FastGame, archive_path=path)
+    run(rounds=2, size=6, seed=0, engine=FastGame, archive_path=path)
+    assert open_archive(path).genes.shape == (2, 6, len(ALL_CARDS))
@@ -0,0 +1,80 @@
+"""
+test_baselines.py
+
+@author Elliot Penson
+"""
+
+import csv
+
+from pytest import raises
+
+from embark.baselines import BASELINES, BaselineMonitor, evaluate
+from embark.cards import WheatField, TrainStation, RadioTower
+from embark.engine import FastGame
+from embark.evolution import make_random_chromosome, run
+from embark.machi_koro import ALL_CARDS, cards_to_mask
+from embark.strategies import CheapestPlayer, ExpensivePlayer, LandmarkRushPlayer
+
+
+def test_greedy_players():
+    mask = cards_to_mask([WheatField, TrainStation, RadioTower])
+    cheapest, expensive, rush = CheapestPlayer(), ExpensivePlayer(), LandmarkRushPlayer()
+    for player in [cheapest, expensive, rush]:
+        player.balance = 5
+    assert cheapest.construct_from_mask(mask) is WheatField
+    assert expensive.construct_from_mask(mask) is TrainStation
+    assert rush.construct_from_mask(mask) is TrainStation
+    rush.balance = 3
+    assert rush.construct_from_mask(mask) is None
+
+
+def test_evaluate():
+    chromosome = make_random_chromosome()
+    genes = [chromosome[card] for card in ALL_CARDS]
+    results = evaluate(genes, games=20, seed=0)
+    assert list(results) == list(BASELINES)
+    for games, rate, low, high in results.values():
+        assert games == 20 and low <= rate <= high
+    assert evaluate(genes, games=20, seed=0) == results
+    assert evaluate(genes, games=20, workers=2, seed=0) == results
+
+
+def test_monitor_during_run(tmp_path):
+    path = tmp_path / "baselines.csv"
+    run(rounds=4, size=4, seed=0, engine=FastGame, baselines_path=str(path),
+        baseline_interval=2, baseline_games=10)
+    with open(path, newline="") as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    assert [row["Generation"] for row in rows] == ["1"] * 4 + ["3"] * 4
+    assert all(int(row["Games"]) == 10 for row in rows)
+
+
+def test_monitor_closes_when_run_fails(tmp_path, monkeypatch):
+    from embark import evolution
+    path = tmp_path / "baselines.csv"
+    iterate, rounds = evolution.iterate, []
+
+    def failing_iterate(generation, **options):
+        rounds.append(len(rounds))
+        if len(rounds) > 2:
+            raise KeyboardInterrupt()
+        return iterate(generation, **options)
+
+    monkeypatch.setattr(evolution, "iterate", failing_iterate)
+    with raises(KeyboardInterrupt):
+        run(rounds=4, size=4, seed=0, engine=FastGame, baselines_path=str(path),
+            baseline_interval=2, baseline_games=10)
+    with open(path, newline="") as csvfile:
+        assert [row["Generation"] for row in csv.DictReader(csvfile)] == ["1"] * 4
+
+
+def test_monitor_skips_champions_while_busy(tmp_path):
+    path = tmp_path / "baselines.csv"
+    chromosome = make_random_chromosome()
+    genes = [chromosome[card] for card in ALL_CARDS]
+    with BaselineMonitor(str(path), games=10, seed=0) as monitor:
+        for generation_index in range(3):
+            monitor.submit(generation_index, genes)
+    with open(path, newline="") as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    assert [row["Generation"] for row in rows] == ["0"] * 4 + ["2"] * 4
@@ -0,0 +1,65 @@
+"""
+test_batch.py
+
+@author Elliot Penson
+"""
+
+from itertools import product
+
+import numpy
+
+from embark.batch import GameBatch, OWN_TURN_ARRAYS, OFF_TURN_ARRAYS
+from embark.engine import FastGame
+from embark.evolution import Organism, set_fitness, make_random_chromosome
+from embark.machi_koro import ALL_CARDS
+from tests.test_engine import CHROMOSOME, HANDS, LANDMARK_RUSH, first_player_win_rate
+
+
+def test_earn_matches_fast_engine():
+    positions = list(product(HANDS, HANDS, [(0, 0), (1, 4), (9, 9)], range(1, 13)))
+    players = Organism(dict(CHROMOSOME)), Organism(dict(CHROMOSOME))
+    batch = GameBatch([players] * len(positions))
+    fast_games = []
+    for game, (active_hand, inactive_hand, balances, roll_number) in enumerate(positions):
+        fast_game = FastGame(*players)
+        for seat, hand in enumerate([active_hand, inactive_hand]):
+            fast_game.hands[seat] = [hand.count(card) for card in ALL_CARDS]
+            fast_game.balances[seat] = balances[seat]
+        batch.hands[game] = fast_game.hands
+        batch.balances[game] = fast_game.balances
+        fast_game.earn(roll_number)
+        fast_games.append(fast_game)
+
+    games = numpy.arange(len(positions))
+    active, inactive = numpy.zeros_like(games), numpy.ones_like(games)
+    rolls = numpy.array([roll_number for *_, roll_number in positions])
+    batch.collect(games, active, inactive, rolls, OWN_TURN_ARRAYS)
+    batch.collect(games, inactive, active, rolls, OFF_TURN_ARRAYS)
+    for game, fast_game in enumerate(fast_games):
+        assert batch.balances[game].tolist() == fast_game.balances
+        assert batch.hands[game].tolist() == fast_game.hands
+
+
+def test_simulate():
+    pairs = [(Organism(make_random_chromosome()), Organism(make_random_chromosome()))
+             for _ in range(50)]
+    batch = GameBatch(pairs, numpy.random.default_rng(0))
+    batch.simulate()
+    for (player1, player2), winner in zip(pairs, batch.winners):
+        assert winner in (player1, player2)
+
+
+def test_statistical_equivalence():
+    numpy.random.seed(0)
+    pair = Organism(dict(LANDMARK_RUSH)), Organism(dict(CHROMOSOME))
+    batch = GameBatch([pair] * 1000, numpy.random.default_rng(0))
+    batch.simulate()
+    batch_rate = sum(winner is pair[0] for winner in batch.winners) / 1000
+    fast_rate = first_player_win_rate(FastGame, LANDMARK_RUSH, CHROMOSOME, 200)
+    assert abs(batch_rate - fast_rate) < 0.15
+
+
+def test_set_fitness():
+    generation = [Organism(make_random_chromosome()) for _ in range(10)]
+    set_fitness(generation, engine=GameBatch)
+    assert sum(organism.wins for organism in generation) == 10 * 9 / 2
@@ -0,0 +1,21 @@
+"""
+test_benchmark.py
+
+@author Elliot Penson
+"""
+
+from embark.benchmark import compare, bench_decisions, bench_engine
+from embark.engine import FastGame
+
+
+def test_compare():
+    baseline = {"engine": {"games/s": 100.0}, "generation": {"seconds": 1.0}}
+    assert compare({"engine": {"games/s": 95.0}, "generation": {"seconds": 1.05}}, baseline) == []
+    assert compare({"engine": {"games/s": 80.0}, "generation": {"seconds": 2.0}}, baseline) == [
+        ("engine", "games/s", 100.0, 80.0), ("generation", "seconds", 1.0, 2.0)]
+    assert compare({"new benchmark": {"games/s": 1.0}}, baseline) == []
+
+
+def test_benchmarks_report_rates():
+    assert bench_decisions(100)["decisions/s"] > 0
+    assert set(bench_engine(FastGame, 2)) == {"games/s", "turns/s"}
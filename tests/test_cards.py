@@ -56,3 +56,12 @@ def test_trading():
     card.notify(card.activation[0])
     assert all(card.__class__ is WheatField for card in game.active_player.hand)
     assert all(card.__class__ is Bakery for card in game.inactive_player.hand)
+
+
+def test_specs_are_shared():
+    game = Game(Player(), Player())
+    first, second = Cafe(game.active_player, game), Cafe(game.inactive_player, game)
+    assert first.spec is second.spec is Cafe.spec
+    assert Cafe.cost == first.cost == 2 and first.activation == (3,)
+    assert CheeseFactory.multiply_on is CardSymbol.ANIMAL
+    assert not hasattr(first, "__dict__")
@@ -0,0 +1,53 @@
+"""
+test_checkpoint.py
+
+@author Elliot Penson
+"""
+
+import random
+
+import numpy
+from pytest import raises
+
+from embark import checkpoint
+from embark.engine import FastGame
+from embark.evolution import run
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "checkpoint.npz"
+    population = numpy.random.random_sample((4, 19))
+    random.random()
+    random.gauss(0, 1)  # Leaves a cached Gaussian in the state.
+    numpy.random.normal()
+    checkpoint.save(path, population, 7)
+    expected = random.random(), random.gauss(0, 1), numpy.random.random_sample(3).tolist()
+
+    loaded_population, generation_index = checkpoint.load(path)
+    assert (loaded_population == population).all()
+    assert generation_index == 7
+    assert (random.random(), random.gauss(0, 1),
+            numpy.random.random_sample(3).tolist()) == expected
+    assert [file.name for file in tmp_path.iterdir()] == ["checkpoint.npz"]
+
+
+def test_resume(tmp_path):
+    interrupted, uninterrupted = tmp_path / "interrupted.npz", tmp_path / "uninterrupted.npz"
+    options = dict(size=6, checkpoint_interval=2, engine=FastGame)
+    run(rounds=2, seed=3, checkpoint_path=interrupted, **options)
+    run(rounds=4, resume_path=interrupted, checkpoint_path=interrupted, **options)
+    run(rounds=4, seed=3, checkpoint_path=uninterrupted, **options)
+
+    resumed, expected = checkpoint.load(interrupted), checkpoint.load(uninterrupted)
+    assert (resumed[0] == expected[0]).all()
+    assert resumed[1] == expected[1] == 4
+
+
+def test_failed_save_leaves_no_file(tmp_path, monkeypatch):
+    def fail(file_descriptor):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(checkpoint.os, "fsync", fail)
+    with raises(OSError):
+        checkpoint.save(tmp_path / "checkpoint.npz", numpy.zeros((2, 19)), 1)
+    assert list(tmp_path.iterdir()) == []
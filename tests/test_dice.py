@@ -0,0 +1,45 @@
+"""
+test_dice.py
+
+@author Elliot Penson
+"""
+
+from collections import Counter
+import random
+
+from numpy.random import SeedSequence
+
+from embark.dice import Dice
+from embark.evolution import Organism, make_random_chromosome
+from embark.machi_koro import Game
+
+
+def test_roll():
+    dice = Dice(0, block_size=10)
+    rolls = [dice.roll() for _ in range(6000)]
+    counts = Counter(rolls)
+    assert set(counts) == {1, 2, 3, 4, 5, 6}
+    assert all(900 < count < 1100 for count in counts.values())
+
+
+def test_seeded_rolls_repeat():
+    seed = SeedSequence(7).spawn(1)[0]
+    # Roll past several block refills of one die, and compare with a second die.
+    first, second = Dice(seed, block_size=64), Dice(seed, block_size=64)
+    rolls = [first.roll() for _ in range(500)]
+    assert rolls == [second.roll() for _ in range(500)]
+    assert len(set(rolls)) == 6
+    assert rolls[:64] != rolls[64:128]  # Each refill draws new rolls.
+
+
+def test_game_replays():
+    chromosomes = make_random_chromosome(), make_random_chromosome()
+    outcomes = []
+    for _ in range(2):
+        random.seed(1)
+        players = Organism(dict(chromosomes[0])), Organism(dict(chromosomes[1]))
+        game = Game(*players, Dice(SeedSequence(5)))
+        game.simulate()
+        outcomes.append((players.index(game.winner), [player.balance for player in players],
+                         [len(player.hand) for player in players]))
+    assert outcomes[0] == outcomes[1]
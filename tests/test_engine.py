@@ -0,0 +1,99 @@
+"""
+test_engine.py
+
+@author Elliot Penson
+"""
+
+from collections import Counter
+import random
+
+import numpy
+
+from embark.cards import (TrainStation, ShoppingMall, AmusementPark, RadioTower, WheatField,
+                          Ranch, Bakery, Cafe, ConvenienceStore, Forest, TVStation, BusinessCenter,
+                          Stadium, CheeseFactory, FurnitureFactory, Mine, FamilyRestaurant,
+                          AppleOrchard, FruitAndVegetableMarket)
+from embark.dice import Dice
+from embark.engine import FastGame
+from embark.evolution import Organism, normalize
+from embark.machi_koro import Game, ALL_CARDS, CARD_INDEX
+
+CHROMOSOME = normalize({card: index + 1 for index, card in enumerate(ALL_CARDS)})
+
+HANDS = [
+    [WheatField, Bakery],
+    [WheatField, WheatField, Ranch, Forest, Mine, AppleOrchard, FruitAndVegetableMarket],
+    [ShoppingMall, Bakery, Bakery, ConvenienceStore, Cafe, FamilyRestaurant, FamilyRestaurant],
+    [Ranch, Ranch, CheeseFactory, Forest, FurnitureFactory, Mine, TrainStation],
+    [TVStation, Stadium, BusinessCenter, Cafe, Cafe, WheatField],
+]
+
+
+def make_games(hands, balances):
+    """Set up an object game and a fast game in the same position."""
+    players = Organism(dict(CHROMOSOME)), Organism(dict(CHROMOSOME))
+    game, fast_game = Game(*players), FastGame(*players)
+    for seat, (player, hand, balance) in enumerate(zip(players, hands, balances)):
+        player.hand = [card(player, game) for card in hand]
+        player.balance = fast_game.balances[seat] = balance
+        fast_game.hands[seat] = [hand.count(card) for card in ALL_CARDS]
+    return game, fast_game
+
+
+def test_earn_matches_object_engine():
+    for active_hand in HANDS:
+        for inactive_hand in HANDS:
+            for balances in [(0, 0), (1, 4), (9, 9)]:
+                for roll_number in range(1, 13):
+                    game, fast_game = make_games([active_hand, inactive_hand], balances)
+                    game.active_player.earn(roll_number)
+                    game.inactive_player.earn(roll_number)
+                    fast_game.earn(roll_number)
+                    for seat, player in enumerate([game.active_player, game.inactive_player]):
+                        assert fast_game.balances[seat] == player.balance
+                        counts = Counter(card.__class__ for card in player.hand)
+                        assert fast_game.hands[seat] == [counts[card] for card in ALL_CARDS]
+
+
+def test_purchase():
+    fast_game = FastGame(Organism(dict(CHROMOSOME)), Organism(dict(CHROMOSOME)))
+    fast_game.purchase_card(WheatField, 0)
+    assert fast_game.hands[0][CARD_INDEX[WheatField]] == 2
+    fast_game.purchase_card(Stadium, 0)
+    # A stadium is too expensive for a new player.
+    assert fast_game.hands[0][CARD_INDEX[Stadium]] == 0
+
+
+def first_player_win_rate(engine, chromosome1, chromosome2, games):
+    player1, player2 = Organism(chromosome1), Organism(chromosome2)
+    wins = 0
+    for seed in range(games):
+        game = engine(player1, player2, Dice(seed))
+        game.simulate()
+        wins += game.winner is player1
+    return wins / games
+
+
+LANDMARK_RUSH = normalize({card: 10 if card in [ShoppingMall, AmusementPark, RadioTower] else 1
+                           for card in ALL_CARDS})
+
+
+def test_statistical_equivalence():
+    random.seed(0)
+    numpy.random.seed(0)
+    games = 200
+    object_rate = first_player_win_rate(Game, LANDMARK_RUSH, CHROMOSOME, games)
+    fast_rate = first_player_win_rate(FastGame, LANDMARK_RUSH, CHROMOSOME, games)
+    # Two binomial proportions of 200 games each; 0.15 is roughly four standard deviations.
+    assert abs(object_rate - fast_rate) < 0.15
+
+
+def test_reset():
+    players = Organism(dict(CHROMOSOME)), Organism(dict(LANDMARK_RUSH))
+    game = FastGame(*players, Dice(0))
+    game.simulate()
+    game.reset(*players[::-1])
+    fresh_game = FastGame(*players[::-1])
+    for attribute in ["players", "hands", "balances", "supply", "establishment_mask",
+                      "landmark_masks", "active", "winner", "turns"]:
+        assert getattr(game, attribute) == getattr(fresh_game, attribute)
@@ -4,9 +4,19 @@ test_evolution.py
 @author Elliot Penson
 """
 
-from pytest import approx
+import numpy
+from pytest import approx, raises
 
-from embark.evolution import normalize
+from embark import evolution
+from embark.cards import WheatField, Ranch, TrainStation
+from embark.engine import FastGame
+from embark.evolution import (Organism, normalize, set_fitness, make_random_chromosome, iterate,
+                              set_adaptive_fitness, sample_tables,
+                              select_parents, crossover, mutate_rows, normalize_rows, to_matrix,
+                              from_matrix, export, load_organisms)
+from embark.machi_koro import ALL_CARDS, CARD_INDEX, cards_to_mask
+from embark.match_cache import MatchCache
+from embark.rating import INITIAL_RATING
 
 
 def test_normalize():
@@ -15,3 +25,191 @@ def test_normalize():
     assert normalize({"key1": 0.5, "key2": 0.5}) == approx({"key1": 0.5, "key2": 0.5})
     assert normalize({"key1": 1, "key2": 1}) == approx({"key1": 0.5, "key2": 0.5})
     assert normalize({"key1": 1, "key2": 0.5}) == approx({"key1": 2/3, "key2": 1/3})
+
+
+def test_set_fitness_is_reproducible_across_workers(monkeypatch):
+    monkeypatch.setattr(evolution, "PAIRINGS_PER_BLOCK", 10)  # Split the games into many blocks.
+    chromosomes = [make_random_chromosome() for _ in range(12)]
+    win_counts = []
+    for workers in [1, 2, 3]:
+        generation = [Organism(dict(chromosome)) for chromosome in chromosomes]
+        set_fitness(generation, engine=FastGame, workers=workers, seed=42)
+        win_counts.append([organism.wins for organism in generation])
+    assert win_counts[0] == win_counts[1] == win_counts[2]
+    assert sum(win_counts[0]) == 12 * 11 / 2
+
+
+def test_run_starts_worker_processes_once(monkeypatch):
+    import concurrent.futures
+    pools = []
+
+    class CountedPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *arguments):
+            super().__init__(*arguments)
+            pools.append(self)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", CountedPool)
+    winner = evolution.run(rounds=3, size=4, seed=0, engine=FastGame, workers=2)
+    assert len(pools) == 1
+    assert (winner.genes == evolution.run(rounds=3, size=4, seed=0, engine=FastGame).genes).all()
+    # Without workers, run uses the default from parameters.py.
+    monkeypatch.setattr(evolution, "WORKERS", 2)
+    assert (evolution.run(rounds=3, size=4, seed=0, engine=FastGame).genes == winner.genes).all()
+    assert len(pools) == 2
+
+
+def test_set_fitness_with_sampled_opponents():
+    generation = [Organism(make_random_chromosome()) for _ in range(10)]
+    set_fitness(generation, engine=FastGame, seed=0, opponents=3)
+    assert sum(organism.wins for organism in generation) == 10 * 3
+    assert sum(organism.rating for organism in generation) == approx(10 * INITIAL_RATING)
+    assert all(organism.fitness > 0 for organism in generation)
+
+
+def test_construct_from_mask():
+    organism = Organism({card: 0 for card in ALL_CARDS})
+    available = {WheatField, Ranch, TrainStation}
+    for _ in range(20):
+        # Without preferences, any available card may be chosen.
+        assert organism.construct(available) in available
+    organism[Ranch] = 1
+    assert all(organism.construct_from_mask(cards_to_mask(available)) is Ranch
+               for _ in range(20))
+    for card in ALL_CARDS:
+        organism.construct_from_mask(cards_to_mask([card, Ranch]))
+    assert len(organism.purchase_tables) <= evolution.PURCHASE_TABLES_PER_ORGANISM
+
+
+def test_set_fitness_with_cache():
+    chromosome = make_random_chromosome()
+    generation = [Organism(dict(chromosome)), Organism(dict(chromosome)),
+                  Organism(make_random_chromosome())]
+    cache = MatchCache(min_games=2)
+    set_fitness(generation, engine=FastGame, seed=0, cache=cache)
+    # The two identical organisms share their games against the third organism.
+    assert len(cache.matchups) == 2
+    assert sum(organism.wins for organism in generation) == approx(3)
+    # Results accumulate until each matchup has been played min_games times.
+    set_fitness(generation, engine=FastGame, seed=1, cache=cache)
+    assert cache.hits == 0
+    assert [games for games, _ in cache.matchups.values()] == [2, 2]
+    set_fitness(generation, engine=FastGame, seed=2, cache=cache)
+    assert cache.hits == 3 and len(cache.matchups) == 2
+    assert [games for games, _ in cache.matchups.values()] == [2, 2]
+
+
+def test_organism_views_population_row():
+    population = numpy.full((2, len(ALL_CARDS)), 0.5)
+    organism = from_matrix(population)[1]
+    organism[Ranch] = 1
+    assert population[1, CARD_INDEX[Ranch]] == 1 and population[0, CARD_INDEX[Ranch]] == 0.5
+    assert organism.chromosome[Ranch] == 1
+    assert to_matrix([organism]).tolist() == [population[1].tolist()]
+
+
+def test_select_parents():
+    numpy.random.seed(0)
+    fitness = numpy.array([0, 1, 3], dtype=float)
+    for selection in ["roulette", "sus"]:
+        parents = select_parents(fitness, 400, selection)
+        assert 0 not in parents
+        assert abs((parents == 2).mean() - 0.75) < 0.1
+    # Stochastic universal sampling gives each organism its expected number of parents.
+    assert (select_parents(fitness, 8, "sus") == 2).sum() == 6
+    assert set(select_parents(numpy.zeros(3), 30)) == {0, 1, 2}
+    with raises(ValueError):
+        select_parents(fitness, 2, "tournament")
+
+
+def test_operators_keep_genes_valid():
+    numpy.random.seed(0)
+    first, second = numpy.zeros((50, len(ALL_CARDS))), numpy.ones((50, len(ALL_CARDS)))
+    children = crossover(first, second)
+    assert set(children.flatten()) == {0, 1}
+    mutated = mutate_rows(children, numpy.arange(50) < 25)
+    assert (mutated[25:] == children[25:]).all()
+    assert ((mutated >= 0) & (mutated <= 1)).all()
+    normalized = normalize_rows(mutated)
+    assert normalized.sum(axis=1) == approx(numpy.ones(50))
+    assert (crossover(first, second, probability=1) == first).all()
+    assert (mutate_rows(children, numpy.ones(50, dtype=bool), width=0) == children).all()
+
+
+def test_iterate():
+    generation = [Organism(make_random_chromosome()) for _ in range(6)]
+    children = iterate(generation, selection="sus", engine=FastGame, seed=0)
+    assert len(children) == 6
+    assert to_matrix(children).sum(axis=1) == approx(numpy.ones(6))
+    culled = iterate(generation, engine=FastGame, seed=0, cull=0.5)
+    assert len(culled) == 6
+    with raises(ValueError):
+        iterate(generation, engine=FastGame, seed=0, cull=1)
+
+
+def test_set_adaptive_fitness():
+    generation = [Organism(make_random_chromosome()) for _ in range(16)]
+    for organism in generation:
+        organism.wins = organism.games = 0
+    rounds_played = [0] * 16
+
+    def play(pairings, seed):
+        # Lower indexes always win.
+        for first, second in pairings:
+            generation[min(first, second)].wins += 1
+            generation[first].games += 1
+            generation[second].games += 1
+        for first in {first for first, _ in pairings}:
+            rounds_played[first] += 1
+
+    set_adaptive_fitness(generation, play, numpy.random.default_rng(0), opponents=6,
+                         budget=400)
+    assert sum(organism.games for organism in generation) // 2 <= 400
+    # The weakest organisms stop playing early, and the strongest keep playing.
+    assert min(rounds_played[:4]) > max(rounds_played[-4:]) >= 1
+    fitness = [organism.fitness for organism in generation]
+    assert fitness[0] > fitness[8] > fitness[-1] == 0
+
+
+def test_set_adaptive_fitness_on_small_populations():
+    for size in [2, 5, 20]:
+        generation = [Organism(make_random_chromosome()) for _ in range(size)]
+        set_fitness(generation, engine=FastGame, seed=0, adaptive=True)
+        assert all(organism.games > 0 for organism in generation)
+        assert sum(organism.games for organism in generation) // 2 <= max(size * (size - 1) // 2,
+                                                                           size)
+    with raises(ValueError):
+        set_adaptive_fitness(generation, None, numpy.random.default_rng(0), budget=10)
+
+
+def test_set_fitness_adaptively():
+    generation = [Organism(make_random_chromosome()) for _ in range(12)]
+    set_fitness(generation, engine=FastGame, seed=0, adaptive=True, opponents=4)
+    assert sum(organism.games for organism in generation) // 2 <= 12 * 11 // 2
+    assert all(0 <= organism.fitness <= 1 for organism in generation)
+
+
+def test_sample_tables():
+    tables = sample_tables(10, 4, 3, numpy.random.default_rng(0))
+    assert len(tables) == 3 * 3
+    assert all(len(set(table)) == 4 for table in tables)
+    assert set(sum(tables[:3], ())) == set(range(10))
+
+
+def test_set_fitness_at_tables():
+    generation = [Organism(make_random_chromosome()) for _ in range(8)]
+    set_fitness(generation, seed=0, table_size=4, table_rounds=3)
+    assert [organism.games for organism in generation] == [3] * 8
+    assert sum(organism.wins for organism in generation) == 2 * 3
+    with raises(ValueError):
+        set_fitness(generation, engine=FastGame, table_size=4)
+
+
+def test_load_organisms(tmp_path):
+    generation = [Organism(make_random_chromosome()) for _ in range(3)]
+    for organism, wins in zip(generation, [1, 5, 2]):
+        organism.wins = wins
+    path = str(tmp_path / "report.csv")
+    export(generation, path)
+    organisms = load_organisms(path)
+    assert list(organisms) == ["0", "1", "2", "best"]
+    assert organisms["best"] == generation[1].genes.tolist()
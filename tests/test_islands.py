@@ -0,0 +1,43 @@
+"""
+test_islands.py
+
+@author Elliot Penson
+"""
+
+import numpy
+from pytest import approx, raises
+
+from embark import islands
+from embark.engine import FastGame
+
+
+def test_destinations():
+    rng = numpy.random.default_rng(0)
+    assert islands.destinations(4, "ring", rng) == [1, 2, 3, 0]
+    for _ in range(10):
+        targets = islands.destinations(4, "random", rng)
+        assert all(target != island for island, target in enumerate(targets))
+
+
+def test_migrate():
+    populations = [[[0], [0], [0]], [[1], [1], [1]]]
+    parents = [[([0.1], 1, 1), ([0.2], 2, 2), ([0.3], 0, 0)],
+               [([1.1], 0, 0), ([1.2], 1, 1), ([1.3], 2, 2)]]
+    islands.migrate(populations, parents, 2, [1, 0])
+    assert populations == [[[0], [1.3], [1.2]], [[1], [0.2], [0.1]]]
+
+
+def test_run_is_reproducible():
+    options = dict(rounds=3, size=4, islands=2, migration_interval=2, migrants=1, seed=7,
+                   engine=FastGame)
+    champion = islands.run(processes=1, **options)
+    assert champion.fitness > 0
+    assert islands.run(processes=2, **options).chromosome == champion.chromosome
+    with raises(ValueError):
+        islands.run(topology="star", **options)
+
+
+def test_run_without_rounds():
+    champion = islands.run(rounds=0, size=4, islands=2, seed=7, processes=1)
+    assert champion.fitness == 0
+    assert sum(champion.chromosome.values()) == approx(1)
@@ -4,10 +4,17 @@ test_machi_koro.py
 @author Elliot Penson
 """
 
+from collections import Counter
 import sys
 
-from embark.machi_koro import Game, Player, LANDMARKS
-from embark.cards import WheatField, Stadium
+from pytest import raises
+
+from embark.dice import Dice
+from embark.machi_koro import Game, GamePool, Player, LANDMARKS, cards_to_mask, mask_to_cards
+from embark.cards import (WheatField, Ranch, Bakery, Cafe, Stadium, TVStation, BusinessCenter,
+                          TrainStation, ShoppingMall)
+from embark.evolution import Organism, make_random_chromosome
+from tests.test_cards import MockPlayer
 
 class TestGame():
 
@@ -44,3 +51,136 @@ class TestPlayer():
         assert not player.has_won()
         player.hand = [landmark(player, None) for landmark in LANDMARKS]
         assert player.has_won()
+
+    def test_hand_indexes(self):
+        game = Game(MockPlayer(), MockPlayer())
+        player, opponent = game.active_player, game.inactive_player
+        player.balance = sys.maxsize
+        for card in [BusinessCenter, Ranch, Ranch, TrainStation, ShoppingMall]:
+            game.purchase_card(card, player)
+        player.earn(BusinessCenter(None, None).activation[0])  # Trade a Bakery for a WheatField.
+        for owner in [player, opponent]:
+            assert owner.card_counts == Counter(card.__class__ for card in owner.hand)
+            assert owner.symbol_counts == Counter(card.symbol for card in owner.hand)
+            for roll_number in range(1, 13):
+                assert owner.activations[roll_number] == [card for card in owner.hand
+                                                          if roll_number in card.activation]
+        assert player.has_card(TrainStation) and not opponent.has_card(TrainStation)
+        assert player.landmark_count == 2
+        assert player.double_roll_cards == player.cafe_bonus_cards == 1
+        assert player.extra_turn_cards == 0
+
+
+def test_masks():
+    assert cards_to_mask([]) == 0
+    assert mask_to_cards(cards_to_mask(LANDMARKS)) == set(LANDMARKS)
+    assert mask_to_cards(cards_to_mask([Ranch, Ranch, Stadium])) == {Ranch, Stadium}
+
+
+def test_reset():
+    players = MockPlayer(), MockPlayer()
+    pool = GamePool()
+    game = pool.acquire(*players, Dice(0))
+    game.active_player.balance = 100
+    for card in [WheatField, TrainStation, ShoppingMall]:
+        game.purchase_card(card, game.active_player)
+    game.active_player.earn(BusinessCenter.activation[0])
+    pool.release(game)
+
+    new_players = MockPlayer(), MockPlayer()
+    assert pool.acquire(*new_players) is game and not pool.free
+    fresh_game = Game(*players)
+    assert game.establishments == fresh_game.establishments
+    assert game.available_mask(new_players[0]) == fresh_game.available_mask(players[0])
+    for player, fresh_player in zip(new_players, players):
+        assert [card.__class__ for card in player.hand] == [WheatField, Bakery]
+        assert all(card.owner is player and card.game is game for card in player.hand)
+        assert player.card_counts == fresh_player.card_counts
+        assert player.balance == fresh_player.balance
+
+
+def test_four_player_turns():
+    players = [Player() for _ in range(4)]
+    game = Game(*players[:2], others=players[2:])
+    assert game.opponents[players[0]] == [players[3], players[2], players[1]]
+    assert game.opponents[players[2]] == [players[1], players[0], players[3]]
+    for seat in [1, 2, 3, 0]:
+        game.switch_player()
+        assert game.active_player is players[seat]
+        assert game.inactive_player is players[(seat + 1) % 4]
+
+
+def test_red_cards_resolve_counter_clockwise():
+    players = [Player() for _ in range(4)]
+    game = Game(*players[:2], others=players[2:])
+    for player in players[1:]:
+        player.add_to_hand(Cafe(player, game))
+    players[0].balance = 1
+    game.earn(Cafe.activation[0])  # The active player's Bakery pays out first.
+    # Then restaurants take coins counter-clockwise, starting to the right of the roller.
+    assert [player.balance for player in players] == [0, 3, 4, 4]
+
+
+def test_purple_cards():
+    players = [Player() for _ in range(3)]
+    game = Game(*players[:2], others=players[2:])
+    owner = game.active_player
+    owner.add_to_hand(Stadium(owner, game))
+    players[1].balance, players[2].balance = 1, 6
+    game.earn(Stadium.activation[0])
+    assert [player.balance for player in players] == [3 + 3, 0, 4]
+
+    owner.remove_from_hand(owner.hand[-1])
+    owner.add_to_hand(TVStation(owner, game))
+    game.earn(TVStation.activation[0])
+    # The TV Station takes from the richest opponent.
+    assert [player.balance for player in players] == [6 + 4, 0, 0]
+
+
+def test_business_center_trades_with_owner_of_favorite():
+    players = [MockPlayer() for _ in range(3)]
+    game = Game(*players[:2], others=players[2:])
+    owner = game.active_player
+    owner.add_to_hand(BusinessCenter(owner, game))
+    players[1].hand = [Bakery(players[1], game)]
+    owner.earn(BusinessCenter.activation[0])  # Trade a Bakery for a WheatField.
+    assert sorted(card.__class__.__name__ for card in owner.hand) == [
+        "BusinessCenter", "WheatField", "WheatField"]
+    assert sorted(card.__class__.__name__ for card in players[2].hand) == ["Bakery", "Bakery"]
+    assert all(card.owner is player for player in players for card in player.hand)
+
+
+def test_four_player_game():
+    players = [Organism(make_random_chromosome()) for _ in range(4)]
+    game = Game(*players[:2], Dice(0), others=players[2:])
+    game.simulate()
+    assert game.winner in players and game.winner.has_won()
+    with raises(ValueError):
+        Game(*players[:2], others=players[2:] + [Organism(make_random_chromosome())])
+
+
+def test_snapshot_and_restore():
+    players = [Organism(make_random_chromosome()) for _ in range(3)]
+    game = Game(*players[:2], Dice(0), others=players[2:])
+    for _ in range(30):
+        game.simulate_round()
+    snapshot = game.snapshot()
+    hands = [sorted(card.__class__.__name__ for card in player.hand) for player in players]
+    balances = [player.balance for player in players]
+    active, mask = game.active_player, game.available_mask(players[1])
+
+    while not game.winner:
+        game.simulate_round()
+    game.restore(snapshot)
+    assert game.snapshot() == snapshot
+    assert [sorted(card.__class__.__name__ for card in player.hand) for player in players] == hands
+    assert [player.balance for player in players] == balances
+    assert all(card.owner is player for player in players for card in player.hand)
+    assert game.active_player is active and game.available_mask(players[1]) == mask
+    assert game.winner is None
+    # Restoring again reuses the same card objects.
+    dealt = [card for player in players for kind in player.dealt_cards for card in kind]
+    game.restore(snapshot)
+    assert [card for player in players for kind in player.dealt_cards for card in kind] == dealt
+    with raises(ValueError):
+        Game(*players[:2]).restore(snapshot)
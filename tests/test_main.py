@@ -0,0 +1,84 @@
+"""
+test_main.py
+
+@author Elliot Penson
+"""
+
+import csv
+import subprocess
+import sys
+
+from pytest import raises
+
+from embark import evolution, parameters
+from embark.__main__ import main
+
+
+def capture_run_options(monkeypatch):
+    """Replace evolution.run with a stand-in. Return the dict its options are stored in."""
+    options = {}
+
+    def run(**kwargs):
+        options.update(kwargs)
+        return evolution.Organism(evolution.make_random_chromosome())
+
+    monkeypatch.setattr(evolution, "run", run)
+    return options
+
+
+def test_evolve(tmp_path, capsys):
+    output = tmp_path / "winner.csv"
+    main(["evolve", "--rounds", "2", "--size", "4", "--engine", "FastGame", "--seed", "0",
+          "--selection", "sus", "--output", str(output)])
+    assert "most fit organism" in capsys.readouterr().out
+    with open(output, newline="") as csvfile:
+        assert len(list(csv.reader(csvfile))) == 2
+
+
+def test_evolve_leaves_parameters_alone(monkeypatch):
+    options = capture_run_options(monkeypatch)
+    main(["evolve", "--mutation-probability", "0.5", "--mutation-width", "0.2",
+          "--recombination-probability", "0.3"])
+    assert (options["mutation_probability"], options["mutation_width"],
+            options["recombination_probability"]) == (0.5, 0.2, 0.3)
+    assert evolution.MUTATION_PROBABILITY == parameters.MUTATION_PROBABILITY
+
+
+def test_run_options_before_and_after_evolve(monkeypatch):
+    options = capture_run_options(monkeypatch)
+    main(["--checkpoint", "run.npz", "--profile", "evolve", "--results", "run.csv"])
+    assert options["checkpoint_path"] == "run.npz" and options["profile"]
+    assert options["results_path"] == "run.csv"
+
+
+def test_cull_must_leave_children():
+    for cull in ["1", "-0.5", "2"]:
+        with raises(SystemExit):
+            main(["evolve", "--cull", cull])
+
+
+def test_islands_reject_unsupported_options(capsys):
+    with raises(SystemExit):
+        main(["evolve", "--islands", "2", "--checkpoint", "run.npz", "--results", "run.csv"])
+    assert "--checkpoint, --results" in capsys.readouterr().err
+
+
+def test_trace_needs_one_game_worker(capsys):
+    with raises(SystemExit):
+        main(["evolve", "--trace", "games.trace", "--workers", "2"])
+    assert "--trace" in capsys.readouterr().err
+
+
+def test_profile_needs_game_engine(capsys):
+    for engine in ["FastGame", "GameBatch"]:
+        with raises(SystemExit):
+            main(["evolve", "--profile", "--engine", engine])
+        assert "--profile" in capsys.readouterr().err
+
+
+def test_startup_skips_interactive_modules():
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, embark.__main__; print(sorted(sys.modules))"],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    for module in ["crayons", "inquirer", "prettytable", "progress", "numpy"]:
+        assert f"'{module}'" not in loaded
@@ -0,0 +1,45 @@
+"""
+test_match_cache.py
+
+@author Elliot Penson
+"""
+
+from pytest import approx
+
+from embark.match_cache import MatchCache, chromosome_key
+
+
+def test_chromosome_key():
+    assert chromosome_key([0.5, 0.25]) == chromosome_key([0.5 + 1e-12, 0.25])
+    assert chromosome_key([0.5, 0.25]) != chromosome_key([0.5, 0.26])
+    assert hash(chromosome_key([0.5, 0.25])) == hash(chromosome_key([0.5, 0.25]))
+
+
+def test_score():
+    cache = MatchCache(min_games=3)
+    key1, key2 = (0.1, 0.9), (0.9, 0.1)
+    assert cache.score(key1, key2) is None
+    cache.record(key1, key2, True)
+    cache.record(key2, key1, True)
+    assert cache.score(key1, key2) is None  # Two games aren't enough.
+    cache.record(key2, key1, True)
+    assert cache.score(key1, key2) == approx(1 / 3)
+    assert cache.score(key2, key1) == approx(2 / 3)
+    assert cache.hits == 2 and cache.misses == 2
+
+
+def test_eviction():
+    cache = MatchCache(max_size=2, min_games=1)
+    cache.record((1,), (2,), True)
+    cache.record((1,), (3,), True)
+    cache.score((1,), (2,))  # Use the first matchup so the second is evicted next.
+    cache.record((1,), (4,), True)
+    assert cache.score((1,), (2,)) == 1
+    assert cache.score((1,), (3,)) is None
+    assert cache.score((1,), (4,)) == 1
+
+
+def test_intern():
+    cache = MatchCache()
+    key = cache.intern(chromosome_key([0.5, 0.25]))
+    assert cache.intern(chromosome_key([0.5, 0.25])) is key
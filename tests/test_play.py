@@ -0,0 +1,28 @@
+"""
+test_play.py
+
+@author Elliot Penson
+"""
+
+import inquirer
+
+from embark.machi_koro import Game
+from embark.play import Human
+from embark.strategies import RandomPlayer
+
+
+def test_choose_opponent(monkeypatch):
+    questions = []
+
+    def answer(asked):
+        questions.extend(asked)
+        return {"choice": asked[0].choices[-1]}
+
+    monkeypatch.setattr(inquirer, "prompt", answer)
+    human, first, second = Human(), RandomPlayer(seed=0), RandomPlayer(seed=1)
+    Game(human, first)
+    assert human.choose_opponent([first]) is first
+    assert not questions  # A lone opponent isn't worth asking about.
+    Game(human, first, others=[second])
+    assert human.choose_opponent([second, first]) is first
+    assert None not in questions[0].choices
@@ -0,0 +1,36 @@
+"""
+test_profiling.py
+
+@author Elliot Penson
+"""
+
+from embark.dice import Dice
+from embark.evolution import Organism, make_random_chromosome, set_fitness
+from embark.machi_koro import Game
+from embark.profiling import Profiler, PHASES
+
+
+def test_game_reports_phases():
+    profiler = Profiler()
+    game = Game(Organism(make_random_chromosome()), Organism(make_random_chromosome()), Dice(0),
+                profiler)
+    game.simulate()
+    assert profiler.games == 1
+    assert profiler.turns == game.turns
+    for phase in ["roll", "earn", "construct"]:
+        assert profiler.calls[phase] == game.turns
+        assert profiler.times[phase] > 0
+
+
+def test_generations():
+    profiler = Profiler()
+    generation = [Organism(make_random_chromosome()) for _ in range(4)]
+    set_fitness(generation, seed=0, profiler=profiler)
+    profiler.end_generation()
+    set_fitness(generation, seed=1, workers=2, profiler=profiler)
+    profiler.end_generation()
+    assert [statistics["games"] for statistics in profiler.generations] == [6, 6]
+    assert profiler.games == 0
+    summary = profiler.summary()
+    assert all(phase in summary for phase in PHASES)
+    assert "2 generations, 12 games" in summary
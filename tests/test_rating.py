@@ -0,0 +1,46 @@
+"""
+test_rating.py
+
+@author Elliot Penson
+"""
+
+from pytest import approx
+
+from embark.rating import (INITIAL_RATING, K_FACTOR, expected_score, update_ratings, strength,
+                           wilson_interval)
+
+
+class Rated:
+
+    def __init__(self, rating=INITIAL_RATING):
+        self.rating = rating
+
+
+def test_expected_score():
+    assert expected_score(1500, 1500) == approx(0.5)
+    assert expected_score(1900, 1500) == approx(10 / 11)
+    assert expected_score(1500, 1900) + expected_score(1900, 1500) == approx(1)
+
+
+def test_update_ratings():
+    loser, winner = Rated(), Rated()
+    update_ratings(loser, winner, 0)
+    assert winner.rating == approx(INITIAL_RATING + K_FACTOR / 2)
+    assert loser.rating == approx(INITIAL_RATING - K_FACTOR / 2)
+    player, opponent = Rated(), Rated()
+    update_ratings(player, opponent, 0.5)
+    assert player.rating == opponent.rating == approx(INITIAL_RATING)
+
+
+def test_strength():
+    assert strength(INITIAL_RATING) == approx(1)
+    assert strength(1900) / strength(1500) == approx(10)
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0, 1)
+    low, high = wilson_interval(5, 10)
+    assert low == approx(1 - high) and low == approx(0.2366, abs=1e-4)
+    low, high = wilson_interval(10, 10)
+    assert 0.7 < low < high == approx(1)
+    assert wilson_interval(50, 100)[1] - wilson_interval(50, 100)[0] < high - low
@@ -0,0 +1,98 @@
+"""
+test_results_log.py
+
+@author Elliot Penson
+"""
+
+import csv
+
+from pytest import raises
+
+from embark.engine import FastGame
+from embark.evolution import Organism, make_random_chromosome, run
+from embark.machi_koro import ALL_CARDS
+from embark.results_log import ResultsLog
+
+
+def read_rows(path):
+    with open(path, newline="") as csvfile:
+        return list(csv.reader(csvfile))
+
+
+def test_write(tmp_path):
+    path = tmp_path / "results.csv"
+    generation = [Organism(make_random_chromosome()) for _ in range(3)]
+    for wins, organism in enumerate(generation):
+        organism.wins = organism.fitness = wins
+    log = ResultsLog(str(path), flush_interval=2)
+    log.write(0, generation)
+    assert not path.exists()  # Still buffered.
+    log.write(1, generation)
+    assert len(read_rows(path)) == 1 + 2 * 3
+    with log:
+        log.write(2, generation)
+
+    rows = read_rows(path)
+    assert rows[0] == ["Generation", "Wins"] + [card.__name__ for card in ALL_CARDS]
+    assert len(rows) == 1 + 3 * 3
+    assert rows[-1][:2] == ["2", "2"]
+    generations = read_rows(tmp_path / "results-generations.csv")
+    assert generations[0] == ["Generation", "MeanFitness", "MaxFitness", "GeneVariance"]
+    assert [row[:3] for row in generations[1:]] == [["0", "1", "2"], ["1", "1", "2"],
+                                                   ["2", "1", "2"]]
+    assert log.organism_rows == log.generation_rows == []
+
+
+def test_truncate(tmp_path):
+    path = tmp_path / "results.csv"
+    generation = [Organism(make_random_chromosome()) for _ in range(2)]
+    for organism in generation:
+        organism.wins = organism.fitness = 1
+    with ResultsLog(str(path), flush_interval=3) as log:
+        for index in range(5):
+            log.write(index, generation)
+        log.truncate(2)  # Drops written and buffered rows alike.
+        log.write(2, generation)
+    assert [row[0] for row in read_rows(path)[1:]] == ["0", "0", "1", "1", "2", "2"]
+    generations = read_rows(tmp_path / "results-generations.csv")
+    assert [row[0] for row in generations[1:]] == ["0", "1", "2"]
+
+
+def test_resumed_run_does_not_repeat_rows(tmp_path):
+    path, checkpoint_path = str(tmp_path / "results.csv"), str(tmp_path / "run.npz")
+    options = dict(rounds=3, size=4, engine=FastGame, checkpoint_path=checkpoint_path,
+                   checkpoint_interval=2, results_path=path)
+    run(seed=0, **options)
+    run(resume_path=checkpoint_path, **options)  # Continues from round 2.
+    assert [row[0] for row in read_rows(path)[1:]] == [str(index) for index in range(3)
+                                                       for _ in range(4)]
+
+
+def test_truncate_everything(tmp_path):
+    path = tmp_path / "results.csv"
+    generation = [Organism(make_random_chromosome()) for _ in range(2)]
+    with ResultsLog(str(path)) as log:
+        log.write(0, generation)
+    with ResultsLog(str(path)) as log:
+        log.truncate(0)
+        assert path.read_text() == ""
+        log.write(0, generation)
+    assert [row[0] for row in read_rows(path)] == ["Generation", "0", "0"]
+
+
+def test_failed_run_writes_buffered_rows(tmp_path, monkeypatch):
+    from embark import evolution
+    path = tmp_path / "results.csv"
+    iterate = evolution.iterate
+    rounds = []
+
+    def failing_iterate(generation, **options):
+        rounds.append(len(rounds))
+        if len(rounds) > 2:
+            raise KeyboardInterrupt()
+        return iterate(generation, **options)
+
+    monkeypatch.setattr(evolution, "iterate", failing_iterate)
+    with raises(KeyboardInterrupt):
+        run(rounds=5, size=4, seed=0, engine=FastGame, results_path=str(path))
+    assert [row[0] for row in read_rows(path)[1:]] == ["0"] * 4 + ["1"] * 4
@@ -0,0 +1,37 @@
+"""
+test_rollout.py
+
+@author Elliot Penson
+"""
+
+from embark.cards import TrainStation, ShoppingMall, AmusementPark, RadioTower, Bakery
+from embark.dice import Dice
+from embark.machi_koro import Game, cards_to_mask
+from embark.rollout import RolloutPlayer
+from embark.strategies import RandomPlayer
+
+
+def make_game(player):
+    """Put the player one Radio Tower away from winning."""
+    game = Game(player, RandomPlayer(seed=0), Dice(0))
+    player.hand = [card(player, game) for card in [TrainStation, ShoppingMall, AmusementPark]]
+    player.balance = 22
+    return game
+
+
+def test_rollout_player_finds_winning_purchase():
+    player = RolloutPlayer(playouts=20, seed=0)
+    game = make_game(player)
+    snapshot = game.snapshot()
+    assert player.construct_from_mask(cards_to_mask([Bakery, RadioTower])) is RadioTower
+    # Playouts leave the real game alone.
+    assert game.snapshot() == snapshot
+
+
+def test_rollout_player_with_workers():
+    player = RolloutPlayer(playouts=8, workers=2, seed=0)
+    try:
+        make_game(player)
+        assert player.construct_from_mask(cards_to_mask([Bakery, RadioTower])) is RadioTower
+    finally:
+        player.close()
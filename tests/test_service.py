@@ -0,0 +1,89 @@
+"""
+test_service.py
+
+@author Elliot Penson
+"""
+
+import asyncio
+import json
+
+import numpy
+
+from embark.service import DecisionService, load_test, serve, run
+
+
+def test_decide_in_batches():
+    genes = [0.0] * 19
+    genes[4], genes[5] = 0.5, 1.0  # WheatField and Ranch.
+    service = DecisionService({"farmer": genes}, batch_window=0.01,
+                              rng=numpy.random.default_rng(0))
+
+    async def decide():
+        service.start()
+        decisions = await asyncio.gather(
+            *[service.decide("farmer", "construct", ["WheatField", "Cafe"]) for _ in range(20)],
+            service.decide("farmer", "choose_favorite_card", ["WheatField", "Ranch", "Cafe"]),
+            service.decide("farmer", "choose_least_favorite_card", ["WheatField", "Ranch"]),
+            service.decide("farmer", "construct", []))
+        service.stop()
+        return decisions
+
+    decisions = run(decide())
+    assert decisions[:20] == ["WheatField"] * 20
+    assert decisions[20:] == ["Ranch", "WheatField", None]
+    assert service.batches == 1
+
+
+def test_load_test(tmp_path):
+    path = str(tmp_path / "service.sock")
+
+    async def measure():
+        started = asyncio.Event()
+        server = asyncio.ensure_future(serve({"best": [1.0] * 19}, path=path, started=started))
+        await started.wait()
+        results = await load_test(path=path, clients=5, requests=20, seed=0)
+        server.cancel()
+        return results
+
+    results = run(measure())
+    assert 0 < results["p50"] <= results["p99"]
+    assert results["requests/s"] > 0
+
+
+def test_bad_requests_get_errors(tmp_path):
+    path = str(tmp_path / "service.sock")
+    lines = [b"not json", b"[1, 2]", b'{"id": 3, "organism": "best", "method": "construct"}',
+             b'{"id": 4, "organism": "best", "method": "construct", "cards": ["Cafe"]}']
+
+    async def send():
+        started = asyncio.Event()
+        server = asyncio.ensure_future(serve({"best": [1.0] * 19}, path=path, started=started))
+        await started.wait()
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b"\n".join(lines) + b"\n")
+        responses = [json.loads(await reader.readline()) for _ in lines]
+        writer.close()
+        server.cancel()
+        return sorted(responses, key=lambda response: response["id"] or 0)
+
+    responses = run(send())
+    assert [response["id"] for response in responses] == [None, None, 3, 4]
+    assert all("error" in response for response in responses[:3])
+    assert responses[3]["card"] == "Cafe"
+
+
+def test_requests_fail_when_the_batcher_dies():
+    service = DecisionService({"best": [1.0] * 19}, batch_window=0)
+
+    def broken(batch):
+        raise ZeroDivisionError()
+
+    service.resolve = broken
+
+    async def decide():
+        service.start()
+        return await asyncio.gather(*[service.decide("best", "construct", ["Cafe"])
+                                      for _ in range(3)], return_exceptions=True)
+
+    errors = run(decide())
+    assert all(isinstance(error, (ZeroDivisionError, RuntimeError)) for error in errors)
@@ -0,0 +1,24 @@
+"""
+test_strategies.py
+
+@author Elliot Penson
+"""
+
+from embark.cards import WheatField, Stadium, TrainStation
+from embark.dice import Dice
+from embark.machi_koro import Game, cards_to_mask
+from embark.strategies import RandomPlayer
+
+
+def test_random_player():
+    player = RandomPlayer(seed=0)
+    game = Game(player, RandomPlayer(seed=1), Dice(0))
+    player.balance = 4
+    available = {WheatField, Stadium, TrainStation}
+    choices = {player.construct_from_mask(cards_to_mask(available)) for _ in range(50)}
+    assert choices == {WheatField, TrainStation}  # The Stadium is too expensive.
+    assert {player.construct(available) for _ in range(50)} == choices
+    player.balance = 0
+    assert player.construct(available) is None
+    game.simulate()
+    assert game.winner is not None
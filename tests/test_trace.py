@@ -0,0 +1,76 @@
+"""
+test_trace.py
+
+@author Elliot Penson
+"""
+
+import numpy
+from pytest import raises
+
+from embark.dice import Dice
+from embark.evolution import Organism, make_random_chromosome, play_pairs, run
+from embark.machi_koro import Game
+from embark.trace import Recorder, read_games, replay, BALANCE, GAME_END, TRADE, TARGET
+
+
+def record(path, pairs, sample_every=1):
+    with Recorder(str(path), sample_every=sample_every, buffer_events=16) as recorder:
+        winners = play_pairs(pairs, seed=numpy.random.SeedSequence(0), recorder=recorder)
+    return winners, read_games(str(path))
+
+
+def test_replay_matches_recorded_games(tmp_path):
+    organisms = [Organism(make_random_chromosome()) for _ in range(4)]
+    pairs = [tuple(organisms[:2]), tuple(organisms)] * 10
+    winners, games = record(tmp_path / "games.trace", pairs)
+    assert len(games) == len(pairs)
+    kinds = numpy.concatenate(games)["kind"]
+    assert (kinds == TRADE).any() and (kinds == TARGET).any()
+    for players, winner, events in zip(pairs, winners, games):
+        replayed = list(replay(events))
+        game = replayed[-1]
+        assert game.turns == events[-1]["value"] and events[-1]["kind"] == GAME_END
+        assert game.players.index(game.winner) == players.index(winner)
+
+
+def test_sampling(tmp_path):
+    organisms = [Organism(make_random_chromosome()) for _ in range(2)]
+    _, games = record(tmp_path / "games.trace", [tuple(organisms)] * 10, sample_every=4)
+    assert [events[0]["value"] for events in games] == [0, 1, 2]
+
+
+def test_replay_detects_divergence(tmp_path):
+    organisms = [Organism(make_random_chromosome()) for _ in range(2)]
+    _, games = record(tmp_path / "games.trace", [tuple(organisms)])
+    events = games[0].copy()
+    events["value"][numpy.flatnonzero(events["kind"] == BALANCE)[-1]] += 1
+    with raises(RuntimeError, match="balances"):
+        list(replay(events))
+
+
+def test_failed_game_gives_back_its_dice(tmp_path):
+    class BrokenOrganism(Organism):
+        def construct_from_mask(self, mask):
+            raise ZeroDivisionError()
+
+    dice = Dice(numpy.random.SeedSequence(0))
+    path = str(tmp_path / "games.trace")
+    with Recorder(path, sample_every=1) as recorder:
+        game = Game(BrokenOrganism(make_random_chromosome()),
+                    Organism(make_random_chromosome()), dice, recorder=recorder)
+        with raises(ZeroDivisionError):
+            game.simulate()
+    assert game.dice is dice and game.trace is None
+    events = read_games(path)[0]
+    assert len(events) > 1 and GAME_END not in events["kind"]
+
+
+def test_trace_evolution(tmp_path):
+    path = str(tmp_path / "games.trace")
+    run(rounds=2, size=4, seed=0, trace_path=path, trace_sample_every=3)
+    games = read_games(path)
+    assert len(games) == 2 * 6 // 3
+    for events in games:
+        assert list(replay(events))[-1].winner
+    with raises(ValueError):
+        run(rounds=1, size=4, seed=0, workers=2, trace_path=path)